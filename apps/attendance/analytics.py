@@ -0,0 +1,205 @@
+"""
+Vectorized class recaps ("rekap") over a students x sessions status matrix.
+
+load_matrix() reads a class's sessions, their presensi and the student names
+(one query each) into an int8 matrix, one row per student and one column per
+session in date order. recap() then derives everything with NumPy array
+operations: status counts, attendance rates, per-mapel rates, the longest run
+of consecutive ALPHA and week-over-week rate changes. The engine has no
+request or response handling, so management commands can use it as well.
+
+NumPy is optional: AVAILABLE is False when it is not installed.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .models import Presensi, SesiPresensi
+from apps.classes import roster
+from apps.users.models import User
+
+AVAILABLE = np is not None
+
+# Matrix cell codes; NOT_EXPECTED means the student was not on that session's roster
+NOT_EXPECTED = 0
+NOT_RECORDED = 1
+STATUS_CODES = {
+    Presensi.Status.HADIR: 2,
+    Presensi.Status.TERLAMBAT: 3,
+    Presensi.Status.IZIN: 4,
+    Presensi.Status.SAKIT: 5,
+    Presensi.Status.ALPHA: 6,
+}
+PRESENT_CODES = (STATUS_CODES[Presensi.Status.HADIR], STATUS_CODES[Presensi.Status.TERLAMBAT])
+ALPHA_CODE = STATUS_CODES[Presensi.Status.ALPHA]
+
+
+@dataclass
+class AttendanceMatrix:
+    kelas_id: int
+    siswa_ids: "np.ndarray"
+    siswa_names: list
+    sesi_ids: "np.ndarray"
+    tanggal: list
+    mapel_ids: "np.ndarray"
+    mapel_names: dict
+    status: "np.ndarray"
+
+    @property
+    def shape(self):
+        return self.status.shape
+
+
+def load_matrix(kelas_id, date_from=None, date_to=None):
+    """Students x sessions status matrix of one class, optionally for a date range"""
+    if not AVAILABLE:
+        raise RuntimeError("numpy is required for attendance analytics")
+
+    sessions = SesiPresensi.objects.filter(kelas_id=kelas_id)
+    if date_from:
+        sessions = sessions.filter(tanggal__gte=date_from)
+    if date_to:
+        sessions = sessions.filter(tanggal__lte=date_to)
+    sessions = list(sessions.order_by('tanggal', 'window_mulai', 'id').values_list(
+        'id', 'tanggal', 'mata_pelajaran_id', 'mata_pelajaran__nama', 'roster_ids',
+    ))
+    sesi_ids = np.array([row[0] for row in sessions], dtype=np.int64)
+
+    presensi = np.array(
+        Presensi.objects.filter(sesi_id__in=sesi_ids.tolist()).values_list('sesi_id', 'siswa_id', 'status'),
+        dtype=object,
+    ).reshape(-1, 3)
+
+    # Everyone on a roster snapshot or with a record, sorted by id for searchsorted;
+    # sessions without a snapshot expect the live roster, as expected_ids does
+    rosters = [row[4] if row[4] is not None else sorted(roster.member_ids(kelas_id)) for row in sessions]
+    roster_sizes = np.array([len(ids) for ids in rosters], dtype=np.int64)
+    roster_siswa = np.array([siswa_id for ids in rosters for siswa_id in ids], dtype=np.int64)
+    recorded_siswa = presensi[:, 1].astype(np.int64)
+    siswa_ids = np.union1d(roster_siswa, recorded_siswa)
+    names = dict(User.objects.filter(id__in=siswa_ids.tolist()).values_list('id', 'name'))
+
+    status = np.zeros((len(siswa_ids), len(sesi_ids)), dtype=np.int8)
+    # Columns in date order but sesi ids are not, so map ids through a sorted index
+    sesi_order = np.argsort(sesi_ids)
+    roster_columns = np.repeat(np.arange(len(sesi_ids)), roster_sizes)
+    status[np.searchsorted(siswa_ids, roster_siswa), roster_columns] = NOT_RECORDED
+    if len(presensi):
+        columns = sesi_order[np.searchsorted(sesi_ids, presensi[:, 0].astype(np.int64), sorter=sesi_order)]
+        codes = np.vectorize(STATUS_CODES.get, otypes=[np.int8])(presensi[:, 2])
+        status[np.searchsorted(siswa_ids, recorded_siswa), columns] = codes
+
+    mapel_ids = np.array([row[2] or 0 for row in sessions], dtype=np.int64)
+    return AttendanceMatrix(
+        kelas_id=kelas_id,
+        siswa_ids=siswa_ids,
+        siswa_names=[names.get(siswa_id, '') for siswa_id in siswa_ids.tolist()],
+        sesi_ids=sesi_ids,
+        tanggal=[row[1] for row in sessions],
+        mapel_ids=mapel_ids,
+        mapel_names={row[2] or 0: row[3] for row in sessions},
+        status=status,
+    )
+
+
+def _rates(present, expected):
+    """present / expected in percent, 0 where nothing was expected"""
+    return np.round(np.divide(present * 100.0, expected, out=np.zeros(present.shape), where=expected > 0), 1)
+
+
+def _one_hot(labels):
+    """Column -> group indicator matrix and the sorted group labels"""
+    groups, index = np.unique(labels, return_inverse=True)
+    return np.eye(len(groups), dtype=np.int64)[index], groups
+
+
+def longest_absence_streaks(matrix):
+    """Longest run of consecutive ALPHA per student, sessions off their roster skipped"""
+    absent = (matrix.status == ALPHA_CODE).astype(np.int64)
+    running = np.cumsum(absent, axis=1)
+    # A streak resets at every expected session the student did not miss
+    resets = (matrix.status != NOT_EXPECTED) & (matrix.status != ALPHA_CODE)
+    base = np.maximum.accumulate(np.where(resets, running, 0), axis=1)
+    streaks = running - base
+    return streaks.max(axis=1) if streaks.size else np.zeros(len(matrix.siswa_ids), dtype=np.int64)
+
+
+def recap(matrix):
+    """Per-student and per-class recap of an AttendanceMatrix, as plain dicts and lists"""
+    status = matrix.status
+    expected = status != NOT_EXPECTED
+    present = np.isin(status, PRESENT_CODES)
+
+    counts = {
+        value.lower(): (status == code).sum(axis=1) for value, code in STATUS_CODES.items()
+    }
+    expected_per_siswa = expected.sum(axis=1)
+    present_per_siswa = present.sum(axis=1)
+    rates = _rates(present_per_siswa, expected_per_siswa)
+    streaks = longest_absence_streaks(matrix)
+
+    # Group columns by mapel and by week with indicator matrices, one matmul each
+    mapel_onehot, mapel_groups = _one_hot(matrix.mapel_ids)
+    mapel_present = present.astype(np.int64) @ mapel_onehot
+    mapel_expected = expected.astype(np.int64) @ mapel_onehot
+
+    week_starts = np.array(
+        [tanggal - timedelta(days=tanggal.weekday()) for tanggal in matrix.tanggal], dtype='datetime64[D]'
+    )
+    week_onehot, weeks = _one_hot(week_starts)
+    week_present = present.astype(np.int64) @ week_onehot
+    week_expected = expected.astype(np.int64) @ week_onehot
+    week_rates = _rates(week_present, week_expected)
+    class_week_rates = _rates(week_present.sum(axis=0), week_expected.sum(axis=0))
+    class_week_deltas = np.diff(class_week_rates, prepend=class_week_rates[:1])
+    # Change between each student's last two weeks, 0 unless expected in both
+    last_deltas = np.zeros(len(matrix.siswa_ids))
+    if len(weeks) > 1:
+        both = (week_expected[:, -1] > 0) & (week_expected[:, -2] > 0)
+        last_deltas = np.where(both, week_rates[:, -1] - week_rates[:, -2], 0.0)
+
+    mapel_labels = [matrix.mapel_names.get(int(mapel_id)) for mapel_id in mapel_groups]
+    students = []
+    for i, siswa_id in enumerate(matrix.siswa_ids.tolist()):
+        students.append({
+            'siswa_id': siswa_id,
+            'nama': matrix.siswa_names[i],
+            **{name: int(values[i]) for name, values in counts.items()},
+            'tidak_tercatat': int((status[i] == NOT_RECORDED).sum()),
+            'total_sesi': int(expected_per_siswa[i]),
+            'persentase_kehadiran': float(rates[i]),
+            'alpha_beruntun_terpanjang': int(streaks[i]),
+            'perubahan_mingguan': round(float(last_deltas[i]), 1),
+            'per_mapel': {
+                label or '-': float(rate)
+                for label, rate, total in zip(mapel_labels, _rates(mapel_present[i], mapel_expected[i]), mapel_expected[i])
+                if total
+            },
+        })
+
+    return {
+        'kelas_id': matrix.kelas_id,
+        'total_sesi': len(matrix.sesi_ids),
+        'total_siswa': len(matrix.siswa_ids),
+        'persentase_kehadiran': float(_rates(present.sum(), expected.sum())),
+        'per_mapel': [
+            {
+                'mata_pelajaran_id': int(mapel_id) or None,
+                'mata_pelajaran_nama': label,
+                'total_sesi': int((matrix.mapel_ids == mapel_id).sum()),
+                'persentase_kehadiran': float(rate),
+            }
+            for mapel_id, label, rate in zip(
+                mapel_groups, mapel_labels, _rates(mapel_present.sum(axis=0), mapel_expected.sum(axis=0))
+            )
+        ],
+        'mingguan': [
+            {'minggu': str(week), 'persentase_kehadiran': float(rate), 'perubahan': round(float(delta), 1)}
+            for week, rate, delta in zip(weeks, class_week_rates, class_week_deltas)
+        ],
+        'siswa': students,
+    }
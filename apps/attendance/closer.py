@@ -0,0 +1,108 @@
+"""
+Closing attendance sessions and filling in absences.
+
+Students who never scanned get an ALPHA row when their session closes, so
+reports can count Presensi rows directly instead of re-joining SiswaKelas.
+Expected members come from each session's roster snapshot, and the rows are
+written with one INSERT ... ON CONFLICT DO NOTHING per call, no matter how
+many sessions are being closed.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone as dj_tz
+
+from . import events, ingest, registry, stats
+from .models import SesiPresensi, Presensi
+from .writes import presensi_written
+from apps.classes import dashboard as guru_dashboard
+from apps.users.models import Settings
+
+
+def insert_alpha(sesi_ids, now=None):
+    """Insert ALPHA for every expected member of these sessions without a presensi
+
+    Returns the inserted rows as unsaved Presensi objects.
+    """
+    sesi_ids = list(sesi_ids)
+    if not sesi_ids:
+        return []
+    now = now or dj_tz.now()
+    sessions = SesiPresensi.objects.filter(id__in=sesi_ids).only('id', 'kelas_id', 'roster_ids')
+    existing = set(Presensi.objects.filter(sesi_id__in=sesi_ids).values_list('sesi_id', 'siswa_id'))
+    rows = [
+        Presensi(
+            sesi_id=sesi.id, siswa_id=siswa_id, status=Presensi.Status.ALPHA, waktu_scan=now, updated_at=now, otomatis=True
+        )
+        for sesi in sessions
+        for siswa_id in sorted(sesi.expected_ids)
+        if (sesi.id, siswa_id) not in existing
+    ]
+    # Rows a late scan inserted meanwhile are skipped by ON CONFLICT
+    return Presensi.insert_missing(rows)
+
+
+def finalize(sesi_ids, now=None):
+    """End-of-session work: flush spooled scans, then record absences
+
+    Run it in the transaction that marks the sessions SELESAI. If it fails
+    they stay AKTIF, and the next sweep closes and finalizes them again.
+    """
+    sesi_ids = list(sesi_ids)
+    with transaction.atomic():
+        for sesi_id in sesi_ids:
+            # Spooled scans must land first or they would be marked ALPHA
+            ingest.flush(sesi_id=sesi_id)
+        rows = insert_alpha(sesi_ids, now)
+        by_sesi = {}
+        for row in rows:
+            by_sesi.setdefault(row.sesi_id, []).append(row)
+        sessions = SesiPresensi.objects.filter(id__in=sesi_ids).only('id', 'kelas_id', 'tanggal', 'roster_ids')
+        for sesi in sessions:
+            presensi_written(sesi.id, by_sesi.get(sesi.id, []), tanggal=sesi.tanggal)
+            # The session now counts towards its members' monthly totals
+            stats.forget_session(sesi)
+            events.publish(sesi.id, 'closed')
+        # sesiAktif on the teachers' home screens
+        guru_dashboard.forget_kelas({sesi.kelas_id for sesi in sessions})
+    return rows
+
+
+def overdue_sessions(now=None):
+    """AKTIF sessions whose window closed or whose auto_absent_time passed
+
+    auto_absent_time (Settings) closes sessions that opened before it as
+    soon as it passes that day; later sessions close with their window.
+    """
+    now = now or dj_tz.now()
+    local_now = dj_tz.localtime(now)
+    auto_absent_time = Settings.get_cached().auto_absent_time
+    cutoff = dj_tz.make_aware(datetime.combine(local_now.date(), auto_absent_time))
+
+    overdue = Q(window_selesai__lt=now) | Q(tanggal__lt=local_now.date())
+    if now >= cutoff:
+        overdue |= Q(window_mulai__lt=cutoff)
+    return SesiPresensi.objects.filter(overdue, status=SesiPresensi.Status.AKTIF)
+
+
+def close_overdue(now=None):
+    """Move every overdue session to SELESAI in one UPDATE and finalize them
+
+    Both happen in one transaction, so a session is never left SELESAI
+    without its ALPHA rows. Returns (closed session count, ALPHA rows inserted).
+    """
+    now = now or dj_tz.now()
+    with transaction.atomic():
+        # Concurrent sweeps skip rows another worker is already closing
+        sessions = list(overdue_sessions(now).select_for_update(skip_locked=True).only('id', 'qr_token'))
+        if not sessions:
+            return 0, 0
+        sesi_ids = [sesi.id for sesi in sessions]
+        SesiPresensi.objects.filter(id__in=sesi_ids, status=SesiPresensi.Status.AKTIF).update(
+            status=SesiPresensi.Status.SELESAI
+        )
+        for sesi in sessions:
+            registry.unregister(sesi)
+        rows = finalize(sesi_ids, now)
+    return len(sesi_ids), len(rows)
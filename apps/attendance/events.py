@@ -0,0 +1,133 @@
+"""
+Pub/sub for live attendance events.
+
+Attendance writes publish small events on a per-session channel once their
+transaction commits, and SesiViewSet.stream relays them to teachers' screens
+as Server-Sent Events. The broker class comes from ATTENDANCE_EVENT_BROKER;
+LocalBroker is an in-process stand-in, so a dashboard only sees events from
+the worker process it is connected to. A shared broker only needs the same
+subscribe/unsubscribe/publish methods.
+
+A browser EventSource cannot send an Authorization header, so the stream also
+accepts ?stream_token=, a short-lived signed token for one user and session
+issued by SesiViewSet.stream_token.
+"""
+import json
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import BaseRenderer
+
+# Idle streams get a comment line this often so proxies keep them open
+HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource reconnects and gets a new snapshot
+MAX_STREAM_SECONDS = 300
+# Stream tokens outlive a few reconnects, then the client asks for a new one
+STREAM_TOKEN_SECONDS = 15 * 60
+STREAM_TOKEN_SALT = "apps.attendance.events.stream"
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class LocalBroker:
+    """In-process broker backed by one bounded queue per subscriber"""
+
+    max_queue = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            self._subscribers[channel].discard(subscriber)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled dashboard drops events rather than blocking writers
+                pass
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.ATTENDANCE_EVENT_BROKER)()
+    return _broker
+
+
+def channel(sesi_id):
+    return f"sesi:{sesi_id}"
+
+
+def publish(sesi_id, event_type, **data):
+    """Publish an event for a session after the current transaction commits"""
+    event = {'type': event_type, 'sesi_id': sesi_id, **data}
+    transaction.on_commit(lambda: get_broker().publish(channel(sesi_id), event))
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF negotiate text/event-stream; errors go out as one SSE event"""
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return format_sse("error", data)
+
+
+def issue_stream_token(sesi_id, user_id):
+    return signing.dumps({'sesi_id': sesi_id, 'user_id': user_id}, salt=STREAM_TOKEN_SALT, compress=True)
+
+
+class StreamTokenAuthentication(BaseAuthentication):
+    """Authenticates ?stream_token=; request.auth holds its claims"""
+
+    def authenticate(self, request):
+        token = request.query_params.get('stream_token')
+        if not token:
+            return None
+        try:
+            claims = signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=STREAM_TOKEN_SECONDS)
+        except signing.BadSignature:
+            raise AuthenticationFailed('stream token tidak valid atau kedaluwarsa')
+        user = get_user_model().objects.filter(id=claims.get('user_id'), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('stream token tidak valid atau kedaluwarsa')
+        return user, claims
@@ -0,0 +1,171 @@
+"""
+Write-behind ingestion for attendance scans.
+
+With SCAN_INGEST_MODE = "batched", scan_view appends validated scans to a
+local SQLite spool and answers with a receipt. A background thread flushes
+the spool into Presensi with Presensi.insert_missing() every
+SCAN_BATCH_INTERVAL_MS, or sooner once SCAN_BATCH_SIZE rows are pending.
+Rows are only removed from the spool after they are written, so scans that
+were acknowledged before a worker restart are flushed by the next worker.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+
+from .models import Presensi, SesiPresensi
+from .writes import presensi_written
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_state_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+_pending = 0
+
+
+def enabled():
+    return settings.SCAN_INGEST_MODE == "batched"
+
+
+def _spool():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        path = settings.SCAN_SPOOL_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sesi_id INTEGER NOT NULL,"
+            " siswa_id INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " waktu_scan TEXT NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+
+def enqueue(sesi_id, siswa_id, status, waktu_scan):
+    """Durably spool a scan and return its receipt id"""
+    global _pending
+    cursor = _spool().execute(
+        "INSERT INTO spool (sesi_id, siswa_id, status, waktu_scan) VALUES (?, ?, ?, ?)",
+        (sesi_id, siswa_id, status, waktu_scan.isoformat()),
+    )
+    _ensure_flusher()
+    with _state_lock:
+        _pending += 1
+        if _pending >= settings.SCAN_BATCH_SIZE:
+            _wakeup.set()
+    return cursor.lastrowid
+
+
+def _live(rows):
+    """Spooled rows whose session and siswa still exist
+
+    Foreign keys are checked when the transaction commits, so a single row
+    pointing at a deleted session would fail the whole batch, and every
+    retry after it. Such rows are dropped up front instead; one deleted
+    between this check and the commit fails that flush, and the retry drops it.
+    """
+    sesi_ids = set(SesiPresensi.objects.filter(id__in={row[1] for row in rows}).values_list('id', flat=True))
+    siswa_ids = set(get_user_model().objects.filter(id__in={row[2] for row in rows}).values_list('id', flat=True))
+    live = []
+    for row in rows:
+        if row[1] in sesi_ids and row[2] in siswa_ids:
+            live.append(row)
+        else:
+            logger.warning("Dropping spooled scan sesi=%s siswa=%s", row[1], row[2])
+    return live
+
+
+def _write(rows):
+    """Bulk insert spooled rows, return the Presensi objects actually inserted"""
+    objs = [
+        Presensi(sesi_id=sesi_id, siswa_id=siswa_id, status=status, waktu_scan=datetime.fromisoformat(waktu_scan))
+        for _, sesi_id, siswa_id, status, waktu_scan in _live(rows)
+    ]
+    return Presensi.insert_missing(objs)
+
+
+def flush(sesi_id=None):
+    """Write spooled scans to the database, optionally for one session only"""
+    global _pending
+    if not enabled():
+        return 0
+
+    query = "SELECT id, sesi_id, siswa_id, status, waktu_scan FROM spool WHERE id > ?"
+    params = []
+    if sesi_id is not None:
+        query += " AND sesi_id = ?"
+        params.append(sesi_id)
+    query += " ORDER BY id LIMIT ?"
+    params.append(settings.SCAN_BATCH_SIZE)
+
+    total = 0
+    last_id = 0
+    with _flush_lock:
+        conn = _spool()
+        while True:
+            # Keyset over the spool: flushed rows stay until the commit deletes them
+            rows = conn.execute(query, [last_id, *params]).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            # The rows and their counters, rollup and projection commit together;
+            # otherwise a crash in between would leave scans that a retry skips
+            with transaction.atomic():
+                by_sesi = {}
+                for obj in _write(rows):
+                    by_sesi.setdefault(obj.sesi_id, []).append(obj)
+                for flushed_sesi_id, objs in by_sesi.items():
+                    # Live events went out when the scans were acknowledged
+                    presensi_written(flushed_sesi_id, objs, publish=False)
+                # Only dropped once committed, which inside a caller's transaction
+                # (closing a session) means that one; a re-flush of these rows is a no-op
+                spooled_ids = [(row[0],) for row in rows]
+                transaction.on_commit(lambda: conn.executemany("DELETE FROM spool WHERE id = ?", spooled_ids))
+            total += len(rows)
+    with _state_lock:
+        _pending = max(_pending - total, 0)
+    return total
+
+
+def discard(sesi_id):
+    """Drop the spooled scans of a session, e.g. one that was deleted"""
+    if not enabled():
+        return
+    with _flush_lock:
+        _spool().execute("DELETE FROM spool WHERE sesi_id = ?", (sesi_id,))
+
+
+def _run():
+    interval = settings.SCAN_BATCH_INTERVAL_MS / 1000
+    while True:
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Flushing the scan spool failed, retrying later")
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _state_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run, name="scan-flusher", daemon=True)
+            _flusher.start()
@@ -0,0 +1,179 @@
+"""
+Django management command untuk benchmark lonjakan scan QR pagi hari
+Usage: python manage.py bench_scan --classes=10 --students=30 --workers=16
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.attendance.models import SesiPresensi
+from apps.classes.models import Kelas, SiswaKelas
+from apps.users.models import User
+
+BENCH_PREFIX = "BENCH"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent scan_view traffic (throughput, latency, queries per scan)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=10, help='Number of classes (default: 10)')
+        parser.add_argument('--students', type=int, default=30, help='Students per class (default: 30)')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent client threads (default: 16)')
+        parser.add_argument(
+            '--retries',
+            type=float,
+            default=0.5,
+            help='Average extra duplicate scans per student, like shaky connections (default: 0.5)',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable scan order')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark classes and sessions')
+
+    def handle(self, *args, **options):
+        num_classes = options['classes']
+        num_students = options['students']
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(f'Database: {connection.vendor}')
+        guru_list, siswa_list = self._seed_users(num_classes, num_students)
+        kelas_list = self._seed_classes(guru_list, siswa_list, num_students)
+
+        try:
+            tokens = self._open_sessions(kelas_list)
+
+            # One scan per student plus random retries, shuffled like a real rush
+            jobs = []
+            for kelas, token in tokens:
+                for siswa_id in SiswaKelas.objects.filter(kelas=kelas).values_list('siswa_id', flat=True):
+                    jobs.append((siswa_id, token))
+                    extra = int(options['retries']) + (rng.random() < options['retries'] % 1)
+                    jobs.extend([(siswa_id, token)] * extra)
+            rng.shuffle(jobs)
+
+            auth = {
+                siswa.id: f'Bearer {RefreshToken.for_user(siswa).access_token}'
+                for siswa in User.objects.filter(id__in={siswa_id for siswa_id, _ in jobs})
+            }
+            self.stdout.write(f'Firing {len(jobs)} scans from {options["workers"]} workers...')
+            results, elapsed = self._fire(jobs, auth, options['workers'])
+
+            close_started = time.perf_counter()
+            self._close_sessions(kelas_list)
+            close_elapsed = time.perf_counter() - close_started
+            self._report(results, elapsed, close_elapsed)
+        finally:
+            if not options['keep']:
+                Kelas.objects.filter(kode__startswith=f'{BENCH_PREFIX}-').delete()
+
+    def _seed_users(self, num_classes, num_students):
+        total_siswa = num_classes * num_students
+        self.stdout.write(self.style.WARNING('Seeding users...'))
+        call_command('seed_users', admin=0, guru=num_classes, siswa=total_siswa, verbosity=0)
+        guru_list = list(
+            User.objects.filter(role=User.Role.GURU, username__in=[f'guru{i}' for i in range(1, num_classes + 1)])
+        )
+        siswa_list = list(
+            User.objects.filter(role=User.Role.SISWA, username__in=[f'siswa{i}' for i in range(1, total_siswa + 1)])
+        )
+        return guru_list, siswa_list
+
+    def _seed_classes(self, guru_list, siswa_list, num_students):
+        Kelas.objects.filter(kode__startswith=f'{BENCH_PREFIX}-').delete()
+        kelas_list = []
+        with transaction.atomic():
+            for i, guru in enumerate(guru_list):
+                kelas = Kelas.objects.create(
+                    kode=f'{BENCH_PREFIX}-{i + 1}',
+                    nama=f'Kelas Bench {i + 1}',
+                    tahun_ajaran='bench',
+                    wali_guru=guru,
+                )
+                members = siswa_list[i * num_students:(i + 1) * num_students]
+                SiswaKelas.objects.bulk_create([SiswaKelas(siswa=siswa, kelas=kelas) for siswa in members])
+                kelas_list.append(kelas)
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(kelas_list)} classes of {num_students} students ready'))
+        return kelas_list
+
+    def _open_sessions(self, kelas_list):
+        """Open sessions through the API so the registry is warmed like production"""
+        tokens = []
+        for kelas in kelas_list:
+            client = Client()
+            response = client.post(
+                '/api/sesi/',
+                {'kelas': kelas.id},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(kelas.wali_guru).access_token}',
+            )
+            tokens.append((kelas, response.json()['qr_token']))
+        return tokens
+
+    def _close_sessions(self, kelas_list):
+        sesi_list = SesiPresensi.objects.filter(
+            kelas__in=kelas_list, status=SesiPresensi.Status.AKTIF
+        ).select_related('kelas__wali_guru')
+        client = Client()
+        for sesi in sesi_list:
+            client.patch(
+                f'/api/sesi/{sesi.id}/selesai/',
+                HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(sesi.kelas.wali_guru).access_token}',
+            )
+
+    def _fire(self, jobs, auth, workers):
+        local = threading.local()
+
+        def scan(job):
+            siswa_id, token = job
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            queries = []
+            started = time.perf_counter()
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                response = local.client.post(
+                    '/api/scan',
+                    {'token': token},
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=auth[siswa_id],
+                )
+            latency = time.perf_counter() - started
+            duplicate = response.status_code == 200 and response.json().get('already_scanned', False)
+            return latency, len(queries), response.status_code, duplicate
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan, jobs))
+        elapsed = time.perf_counter() - started
+        return results, elapsed
+
+    def _report(self, results, elapsed, close_elapsed):
+        latencies = sorted(latency * 1000 for latency, _, _, _ in results)
+        ok = [r for r in results if r[2] == 200]
+        duplicates = sum(1 for r in ok if r[3])
+        errors = len(results) - len(ok)
+        total_queries = sum(r[1] for r in results)
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(f'Scans          : {len(results)} ({errors} non-200)')
+        self.stdout.write(f'Throughput     : {len(results) / elapsed:.1f} scans/s over {elapsed:.2f}s')
+        self.stdout.write(
+            f'Latency (ms)   : p50 {percentile(latencies, 50):.1f}  '
+            f'p95 {percentile(latencies, 95):.1f}  p99 {percentile(latencies, 99):.1f}'
+        )
+        self.stdout.write(f'Queries / scan : {total_queries / len(results):.2f}' if results else 'Queries / scan : -')
+        self.stdout.write(f'Duplicate rate : {duplicates / len(ok) * 100:.1f}%' if ok else 'Duplicate rate : -')
+        self.stdout.write(f'Close sessions : {close_elapsed * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,45 @@
+"""
+Django management command untuk menutup sesi presensi yang sudah lewat waktu
+Usage: python manage.py close_overdue_sessions [--dry-run] [--every=60]
+(jalankan dari cron, misalnya setiap 5 menit, atau sebagai proses dengan --every)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.attendance import closer
+
+
+class Command(BaseCommand):
+    help = 'Close overdue AKTIF sessions and insert ALPHA for students who never scanned'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the sessions that would be closed',
+        )
+        parser.add_argument(
+            '--every',
+            type=int,
+            default=0,
+            help='Keep running and close overdue sessions every N seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            sessions = closer.overdue_sessions().select_related('kelas').order_by('tanggal', 'id')
+            for sesi in sessions:
+                self.stdout.write(f'  - Sesi {sesi.id} {sesi.kelas.nama} {sesi.tanggal} (window_selesai {sesi.window_selesai})')
+            self.stdout.write(self.style.WARNING(f'{len(sessions)} sessions would be closed'))
+            return
+
+        while True:
+            close_old_connections()
+            closed, alpha = closer.close_overdue()
+            if closed or not options['every']:
+                self.stdout.write(self.style.SUCCESS(f'✓ Closed {closed} sessions, recorded {alpha} ALPHA'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
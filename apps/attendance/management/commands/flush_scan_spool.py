@@ -0,0 +1,18 @@
+"""
+Django management command untuk menulis scan yang masih di spool ke database
+Usage: python manage.py flush_scan_spool
+"""
+from django.core.management.base import BaseCommand
+
+from apps.attendance import ingest
+
+
+class Command(BaseCommand):
+    help = 'Flush spooled attendance scans (SCAN_INGEST_MODE=batched) into Presensi'
+
+    def handle(self, *args, **options):
+        if not ingest.enabled():
+            self.stdout.write(self.style.WARNING('SCAN_INGEST_MODE is not "batched", nothing to flush'))
+            return
+        total = ingest.flush()
+        self.stdout.write(self.style.SUCCESS(f'✓ Flushed {total} spooled scans'))
@@ -0,0 +1,36 @@
+"""
+Django management command untuk membangun ulang proyeksi riwayat siswa
+Usage: python manage.py rebuild_riwayat [--from=2025-01-01] [--to=2025-06-30] [--batch-size=200]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.attendance import readmodel
+from apps.attendance.management.options import parse_date
+from apps.attendance.models import SesiPresensi
+
+
+class Command(BaseCommand):
+    help = 'Re-copy Presensi into the RiwayatSiswa projection, a batch of sessions per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First session date (default: all)')
+        parser.add_argument('--to', dest='date_to', help='Last session date (default: all)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Sessions synced per transaction')
+
+    def handle(self, *args, **options):
+        sessions = SesiPresensi.objects.order_by('id')
+        if options['date_from']:
+            sessions = sessions.filter(tanggal__gte=parse_date(options['date_from']))
+        if options['date_to']:
+            sessions = sessions.filter(tanggal__lte=parse_date(options['date_to']))
+        sesi_ids = list(sessions.values_list('id', flat=True))
+        batch_size = max(1, options['batch_size'])
+
+        for start in range(0, len(sesi_ids), batch_size):
+            batch = sesi_ids[start:start + batch_size]
+            with transaction.atomic():
+                readmodel.sync(batch)
+            self.stdout.write(f'  - Sesi {batch[0]} .. {batch[-1]}')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Synced riwayat of {len(sesi_ids)} sessions'))
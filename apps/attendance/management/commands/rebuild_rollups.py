@@ -0,0 +1,43 @@
+"""
+Django management command untuk membangun ulang rekap harian presensi
+Usage: python manage.py rebuild_rollups [--from=2025-01-01] [--to=2025-06-30] [--chunk-days=31]
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from apps.attendance import rollup
+from apps.attendance.management.options import parse_date
+from apps.attendance.models import SesiPresensi
+
+
+class Command(BaseCommand):
+    help = 'Recompute the RekapHarian rollup from Presensi, one date chunk per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First date (default: first session date)')
+        parser.add_argument('--to', dest='date_to', help='Last date (default: last session date)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        bounds = SesiPresensi.objects.aggregate(first=Min('tanggal'), last=Max('tanggal'))
+        date_from = parse_date(options['date_from']) if options['date_from'] else bounds['first']
+        date_to = parse_date(options['date_to']) if options['date_to'] else bounds['last']
+        if date_from is None or date_to is None:
+            self.stdout.write(self.style.SUCCESS('✓ No sessions, nothing to rebuild'))
+            return
+        if date_from > date_to:
+            raise CommandError('--from must not be after --to')
+        chunk_days = max(1, options['chunk_days'])
+
+        rows = 0
+        start = date_from
+        while start <= date_to:
+            end = min(start + timedelta(days=chunk_days - 1), date_to)
+            written = rollup.rebuild(start, end)
+            self.stdout.write(f'  - {start} .. {end}: {written} rows')
+            rows += written
+            start = end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt rollup {date_from} .. {date_to}: {rows} rows'))
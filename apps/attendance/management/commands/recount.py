@@ -0,0 +1,66 @@
+"""
+Django management command untuk menghitung ulang counter presensi per sesi
+Usage: python manage.py recount [--sesi=12 --sesi=13] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from apps.attendance.models import COUNTER_FIELDS, Presensi, SesiPresensi
+from apps.classes.models import SiswaKelas
+
+BATCH_SIZE = 500
+FIELDS = [*COUNTER_FIELDS.values(), 'roster_size']
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized presensi counters and roster_size of each session'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sesi', type=int, action='append', help='Only this session id (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report sessions that drifted')
+
+    def handle(self, *args, **options):
+        sessions = SesiPresensi.objects.order_by('id')
+        if options['sesi']:
+            sessions = sessions.filter(id__in=options['sesi'])
+        sesi_ids = list(sessions.values_list('id', flat=True))
+
+        # Live roster sizes, only for sessions opened before roster snapshots
+        roster_sizes = dict(
+            SiswaKelas.objects.values('kelas_id').annotate(n=Count('id')).values_list('kelas_id', 'n')
+        )
+        repaired = 0
+        for start in range(0, len(sesi_ids), BATCH_SIZE):
+            repaired += self._repair(sesi_ids[start:start + BATCH_SIZE], roster_sizes, options['dry_run'])
+
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'✓ Checked {len(sesi_ids)} sessions, {repaired} {verb}'))
+
+    def _repair(self, sesi_ids, roster_sizes, dry_run):
+        """Recount one batch of sessions with a single grouped query"""
+        with transaction.atomic():
+            # Lock the sessions before counting: a scan committing meanwhile
+            # then applies its own increment on top of the recounted value
+            batch = list(SesiPresensi.objects.select_for_update().filter(id__in=sesi_ids).only('id', 'kelas_id', 'roster_ids', *FIELDS))
+            counts = {
+                row.pop('sesi_id'): row
+                for row in Presensi.objects.filter(sesi_id__in=sesi_ids).values('sesi_id').annotate(**{
+                    field: Count('id', filter=Q(status=status)) for status, field in COUNTER_FIELDS.items()
+                })
+            }
+            changed = []
+            for sesi in batch:
+                expected = counts.get(sesi.id, dict.fromkeys(COUNTER_FIELDS.values(), 0))
+                if sesi.roster_ids is not None:
+                    expected['roster_size'] = len(sesi.roster_ids)
+                else:
+                    expected['roster_size'] = roster_sizes.get(sesi.kelas_id, 0)
+                if any(getattr(sesi, field) != expected[field] for field in FIELDS):
+                    self.stdout.write(f'  - Sesi {sesi.id}: ' + ', '.join(f'{f}={expected[f]}' for f in FIELDS))
+                    for field in FIELDS:
+                        setattr(sesi, field, expected[field])
+                    changed.append(sesi)
+            if changed and not dry_run:
+                SesiPresensi.objects.bulk_update(changed, FIELDS)
+        return len(changed)
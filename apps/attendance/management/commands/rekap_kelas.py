@@ -0,0 +1,48 @@
+"""
+Django management command untuk mencetak rekap presensi satu kelas
+Usage: python manage.py rekap_kelas --kelas=3 [--from=2025-01-01] [--to=2025-06-30] [--json]
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance import analytics
+from apps.attendance.management.options import parse_date
+from apps.classes.models import Kelas
+
+
+class Command(BaseCommand):
+    help = 'Print the attendance recap (counts, rates, streaks, weekly trend) of one class'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kelas', type=int, required=True, help='Kelas id')
+        parser.add_argument('--from', dest='date_from', help='First date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last date (YYYY-MM-DD)')
+        parser.add_argument('--json', action='store_true', help='Print the full recap as JSON')
+
+    def handle(self, *args, **options):
+        if not analytics.AVAILABLE:
+            raise CommandError('numpy is required for attendance recaps')
+        kelas = Kelas.objects.filter(id=options['kelas']).first()
+        if kelas is None:
+            raise CommandError(f'Kelas {options["kelas"]} not found')
+        date_from = parse_date(options['date_from']) if options['date_from'] else None
+        date_to = parse_date(options['date_to']) if options['date_to'] else None
+
+        result = analytics.recap(analytics.load_matrix(kelas.id, date_from, date_to))
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2, default=str))
+            return
+
+        for row in result['siswa']:
+            self.stdout.write(
+                f"  - {row['nama'] or row['siswa_id']}: {row['persentase_kehadiran']}% "
+                f"(H {row['hadir']}, T {row['terlambat']}, I {row['izin']}, S {row['sakit']}, A {row['alpha']}), "
+                f"alpha beruntun {row['alpha_beruntun_terpanjang']}, minggu ini {row['perubahan_mingguan']:+}"
+            )
+        for row in result['per_mapel']:
+            self.stdout.write(f"  * {row['mata_pelajaran_nama'] or '-'}: {row['persentase_kehadiran']}%")
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {kelas.nama}: {result['total_siswa']} siswa, {result['total_sesi']} sesi, "
+            f"{result['persentase_kehadiran']}% hadir"
+        ))
@@ -9,8 +9,10 @@ from datetime import date, timedelta
 import random
 import secrets
 
-from apps.attendance.models import SesiPresensi, Presensi
-from apps.classes.models import Kelas, SiswaKelas, MataPelajaran
+from apps.attendance import rollup
+from apps.attendance.models import SesiPresensi, Presensi, RekapHarian
+from apps.attendance.writes import presensi_written
+from apps.classes.models import Kelas, MataPelajaran
 from apps.users.models import User
 
 
@@ -37,6 +39,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('Clearing existing attendance data...'))
             Presensi.objects.all().delete()
             SesiPresensi.objects.all().delete()
+            RekapHarian.objects.all().delete()
             self.stdout.write(self.style.SUCCESS('✓ Attendance data cleared'))
 
         # Check if there's data to seed
@@ -78,8 +81,8 @@ class Command(BaseCommand):
                     )
                     end_time = start_time + timedelta(hours=1)
                     
-                    # Create sesi
-                    sesi = SesiPresensi.objects.create(
+                    # Create sesi with its roster snapshot, like SesiViewSet.aktif
+                    sesi = SesiPresensi(
                         kelas=kelas,
                         mata_pelajaran=mapel,
                         tanggal=target_date,
@@ -88,12 +91,12 @@ class Command(BaseCommand):
                         qr_token=secrets.token_urlsafe(24),
                         status=SesiPresensi.Status.SELESAI
                     )
+                    sesi.snapshot_roster()
+                    sesi.save()
                     total_sesi += 1
                     
-                    # Get siswa in this kelas
-                    siswa_kelas = SiswaKelas.objects.filter(kelas=kelas).select_related('siswa')
-                    
-                    for sk in siswa_kelas:
+                    rows = []
+                    for siswa_id in sesi.roster_ids:
                         # 85% chance hadir, 5% terlambat, 3% izin, 3% sakit, 4% alpha
                         rand = random.random()
                         if rand < 0.85:
@@ -107,13 +110,15 @@ class Command(BaseCommand):
                         else:
                             status = Presensi.Status.ALPHA
                         
-                        # Create presensi
-                        Presensi.objects.create(
-                            sesi=sesi,
-                            siswa=sk.siswa,
-                            status=status
-                        )
-                        total_presensi += 1
+                        rows.append(Presensi(sesi=sesi, siswa_id=siswa_id, status=status))
+                    
+                    # Create presensi, then counters, rollup and history like any other write
+                    Presensi.objects.bulk_create(rows)
+                    presensi_written(sesi.id, rows, publish=False, tanggal=target_date)
+                    total_presensi += len(rows)
+            
+            # Recompute the seeded days from Presensi, whatever the rollup held before
+            rollup.rebuild(date.today() - timedelta(days=days), date.today() - timedelta(days=1))
             
             self.stdout.write(self.style.SUCCESS(f'\n✓ Created {total_sesi} sesi presensi'))
             self.stdout.write(self.style.SUCCESS(f'✓ Created {total_presensi} presensi records'))
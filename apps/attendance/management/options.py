@@ -0,0 +1,14 @@
+"""
+Option parsing shared by the attendance management commands.
+"""
+from datetime import date
+
+from django.core.management.base import CommandError
+
+
+def parse_date(value):
+    """A --from/--to value as a date, CommandError unless it is YYYY-MM-DD"""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
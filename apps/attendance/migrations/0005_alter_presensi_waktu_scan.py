@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_alter_presensi_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='presensi',
+            name='waktu_scan',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_alter_presensi_waktu_scan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presensi',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_presensi_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sesipresensi',
+            index=models.Index(condition=models.Q(('status', 'AKTIF')), fields=['kelas', 'window_selesai'], name='sesi_aktif_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+COUNTER_FIELDS = {
+    "HADIR": "jumlah_hadir",
+    "TERLAMBAT": "jumlah_terlambat",
+    "IZIN": "jumlah_izin",
+    "SAKIT": "jumlah_sakit",
+    "ALPHA": "jumlah_alpha",
+}
+
+
+def backfill_counters(apps, schema_editor):
+    SesiPresensi = apps.get_model("attendance", "SesiPresensi")
+    Presensi = apps.get_model("attendance", "Presensi")
+    SiswaKelas = apps.get_model("classes", "SiswaKelas")
+
+    roster_sizes = dict(
+        SiswaKelas.objects.values("kelas_id").annotate(n=Count("id")).values_list("kelas_id", "n")
+    )
+    counts = {
+        row.pop("sesi_id"): row
+        for row in Presensi.objects.values("sesi_id").annotate(**{
+            field: Count("id", filter=Q(status=status)) for status, field in COUNTER_FIELDS.items()
+        })
+    }
+    sessions = list(SesiPresensi.objects.only("id", "kelas_id"))
+    for sesi in sessions:
+        for field, value in counts.get(sesi.id, {}).items():
+            setattr(sesi, field, value)
+        sesi.roster_size = roster_sizes.get(sesi.kelas_id, 0)
+    SesiPresensi.objects.bulk_update(
+        sessions, [*COUNTER_FIELDS.values(), "roster_size"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_sesipresensi_sesi_aktif_idx'),
+        ('classes', '0004_alter_jadwal_options_jadwal_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='jumlah_alpha',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='jumlah_hadir',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='jumlah_izin',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='jumlah_sakit',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='jumlah_terlambat',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='roster_size',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
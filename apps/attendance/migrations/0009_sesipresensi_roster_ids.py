@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+def backfill_roster_ids(apps, schema_editor):
+    """Best available snapshot: today's roster plus everyone with a presensi"""
+    SesiPresensi = apps.get_model("attendance", "SesiPresensi")
+    Presensi = apps.get_model("attendance", "Presensi")
+    SiswaKelas = apps.get_model("classes", "SiswaKelas")
+
+    rosters = {}
+    for kelas_id, siswa_id in SiswaKelas.objects.values_list("kelas_id", "siswa_id"):
+        rosters.setdefault(kelas_id, set()).add(siswa_id)
+    recorded = {}
+    for sesi_id, siswa_id in Presensi.objects.values_list("sesi_id", "siswa_id"):
+        recorded.setdefault(sesi_id, set()).add(siswa_id)
+
+    sessions = list(SesiPresensi.objects.only("id", "kelas_id"))
+    for sesi in sessions:
+        sesi.roster_ids = sorted(rosters.get(sesi.kelas_id, set()) | recorded.get(sesi.id, set()))
+        sesi.roster_size = len(sesi.roster_ids)
+    SesiPresensi.objects.bulk_update(sessions, ["roster_ids", "roster_size"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_sesipresensi_counters'),
+        ('classes', '0004_alter_jadwal_options_jadwal_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesipresensi',
+            name='roster_ids',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(backfill_roster_ids, migrations.RunPython.noop),
+    ]
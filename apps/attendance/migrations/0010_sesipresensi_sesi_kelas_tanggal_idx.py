@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_sesipresensi_roster_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sesipresensi',
+            index=models.Index(fields=['kelas', 'tanggal', 'id'], name='sesi_kelas_tanggal_idx'),
+        ),
+    ]
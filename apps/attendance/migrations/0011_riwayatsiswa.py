@@ -0,0 +1,65 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_riwayat(apps, schema_editor):
+    Presensi = apps.get_model("attendance", "Presensi")
+    RiwayatSiswa = apps.get_model("attendance", "RiwayatSiswa")
+
+    batch = []
+    presensi_qs = Presensi.objects.select_related("sesi__kelas__wali_guru", "sesi__mata_pelajaran")
+    for presensi in presensi_qs.iterator(chunk_size=2000):
+        sesi = presensi.sesi
+        batch.append(RiwayatSiswa(
+            presensi_id=presensi.id,
+            siswa_id=presensi.siswa_id,
+            sesi_id=sesi.id,
+            kelas_id=sesi.kelas_id,
+            tanggal=sesi.tanggal,
+            kelas_nama=sesi.kelas.nama,
+            mata_pelajaran_nama=sesi.mata_pelajaran.nama if sesi.mata_pelajaran else None,
+            guru_nama=sesi.kelas.wali_guru.name if sesi.kelas.wali_guru else None,
+            window_mulai=sesi.window_mulai,
+            window_selesai=sesi.window_selesai,
+            waktu_scan=presensi.waktu_scan,
+            status=presensi.status,
+        ))
+        if len(batch) >= 2000:
+            RiwayatSiswa.objects.bulk_create(batch)
+            batch = []
+    RiwayatSiswa.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_sesipresensi_sesi_kelas_tanggal_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiwayatSiswa',
+            fields=[
+                ('presensi', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='riwayat', serialize=False, to='attendance.presensi')),
+                ('kelas_id', models.IntegerField()),
+                ('tanggal', models.DateField()),
+                ('kelas_nama', models.CharField(max_length=120)),
+                ('mata_pelajaran_nama', models.CharField(blank=True, max_length=100, null=True)),
+                ('guru_nama', models.CharField(blank=True, max_length=200, null=True)),
+                ('window_mulai', models.DateTimeField(blank=True, null=True)),
+                ('window_selesai', models.DateTimeField(blank=True, null=True)),
+                ('waktu_scan', models.DateTimeField()),
+                ('status', models.CharField(choices=[('HADIR', 'Hadir'), ('TERLAMBAT', 'Terlambat'), ('IZIN', 'Izin'), ('SAKIT', 'Sakit'), ('ALPHA', 'Alpha')], max_length=10)),
+                ('sesi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='riwayat_siswa', to='attendance.sesipresensi')),
+                ('siswa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='riwayat_presensi', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['siswa', 'tanggal', 'waktu_scan', 'presensi'], name='riwayat_siswa_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_riwayat, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:12
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def backfill_rekap(apps, schema_editor):
+    RekapHarian = apps.get_model("attendance", "RekapHarian")
+    Presensi = apps.get_model("attendance", "Presensi")
+    SesiPresensi = apps.get_model("attendance", "SesiPresensi")
+    qn = schema_editor.connection.ops.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {qn(RekapHarian._meta.db_table)} (tanggal, kelas_id, mata_pelajaran_id, status, jumlah)
+            SELECT s.tanggal, s.kelas_id, s.mata_pelajaran_id, p.status, COUNT(*)
+            FROM {qn(Presensi._meta.db_table)} p
+            JOIN {qn(SesiPresensi._meta.db_table)} s ON s.id = p.sesi_id
+            GROUP BY s.tanggal, s.kelas_id, s.mata_pelajaran_id, p.status
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_riwayatsiswa'),
+        ('classes', '0004_alter_jadwal_options_jadwal_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('status', models.CharField(choices=[('HADIR', 'Hadir'), ('TERLAMBAT', 'Terlambat'), ('IZIN', 'Izin'), ('SAKIT', 'Sakit'), ('ALPHA', 'Alpha')], max_length=10)),
+                ('jumlah', models.IntegerField(default=0)),
+                ('kelas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekap_harian', to='classes.kelas')),
+                ('mata_pelajaran', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='rekap_harian', to='classes.matapelajaran')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(models.F('tanggal'), models.F('kelas'), django.db.models.functions.comparison.Coalesce('mata_pelajaran', 0), models.F('status'), name='rekap_harian_key')],
+            },
+        ),
+        migrations.RunPython(backfill_rekap, migrations.RunPython.noop),
+    ]
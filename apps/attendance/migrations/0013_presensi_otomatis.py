@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_rekapharian'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presensi',
+            name='otomatis',
+            field=models.BooleanField(default=False),
+        ),
+    ]
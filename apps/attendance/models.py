@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import Q
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+from apps.classes import roster
 from apps.classes.models import Kelas, Jadwal, MataPelajaran
 
 
@@ -24,11 +28,50 @@ class SesiPresensi(models.Model):
     qr_token = models.CharField(max_length=64, unique=True)
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.DRAFT)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by writes.presensi_written, repaired by `manage.py recount`
+    jumlah_hadir = models.IntegerField(default=0)
+    jumlah_terlambat = models.IntegerField(default=0)
+    jumlah_izin = models.IntegerField(default=0)
+    jumlah_sakit = models.IntegerField(default=0)
+    jumlah_alpha = models.IntegerField(default=0)
+    roster_size = models.IntegerField(default=0)
+    # Members expected when the session was opened, so history stays stable;
+    # None for sessions never opened through the API (no snapshot taken)
+    roster_ids = models.JSONField(null=True, blank=True, default=None)
+
+    class Meta:
+        indexes = [
+            # Only the handful of open sessions, for dashboards and the closer
+            models.Index(
+                fields=["kelas", "window_selesai"],
+                condition=models.Q(status="AKTIF"),
+                name="sesi_aktif_idx",
+            ),
+            # Keyset pagination of session history
+            models.Index(fields=["kelas", "tanggal", "id"], name="sesi_kelas_tanggal_idx"),
+        ]
 
     def __str__(self):
         mapel_str = f" - {self.mata_pelajaran.nama}" if self.mata_pelajaran else ""
         return f"Sesi {self.kelas.kode}{mapel_str} {self.tanggal} [{self.status}]"
 
+    def snapshot_roster(self):
+        """Freeze the current class roster as this session's expected members"""
+        self.roster_ids = sorted(roster.member_ids(self.kelas_id))
+        self.roster_size = len(self.roster_ids)
+
+    @property
+    def expected_ids(self):
+        """Snapshot of expected members, the live roster when none was taken"""
+        if self.roster_ids is not None:
+            return set(self.roster_ids)
+        return roster.member_ids(self.kelas_id)
+
+    @property
+    def jumlah_presensi(self):
+        """Members with any presensi row, whatever its status"""
+        return sum(getattr(self, field) for field in COUNTER_FIELDS.values())
+
 
 class Presensi(models.Model):
     class Status(models.TextChoices):
@@ -40,9 +83,13 @@ class Presensi(models.Model):
 
     sesi = models.ForeignKey(SesiPresensi, on_delete=models.CASCADE, related_name="presensi_list")
     siswa = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="presensi_siswa")
-    waktu_scan = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: batched and offline ingestion keep the original scan time
+    waktu_scan = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.HADIR)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+    # ALPHA filled in by the closer rather than recorded by anyone; only these
+    # may be replaced by a late-synced kiosk scan
+    otomatis = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ("sesi", "siswa")
@@ -50,6 +97,184 @@ class Presensi(models.Model):
             models.Index(fields=["sesi"]),
         ]
 
+    @classmethod
+    def record_scan(cls, sesi_id, siswa_id, status=Status.HADIR):
+        """Insert a presensi unless one exists, return (presensi, created)
+
+        On PostgreSQL this is a single INSERT ... ON CONFLICT DO NOTHING that
+        also returns the existing row on a duplicate. Other backends insert and
+        fall back to a SELECT when the unique constraint fires.
+        """
+        now = timezone.now()
+        if connection.vendor == "postgresql":
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    WITH ins AS (
+                        INSERT INTO {table} (sesi_id, siswa_id, waktu_scan, status, updated_at, otomatis)
+                        VALUES (%s, %s, %s, %s, %s, FALSE)
+                        ON CONFLICT (sesi_id, siswa_id) DO NOTHING
+                        RETURNING id, waktu_scan, status
+                    )
+                    SELECT id, waktu_scan, status, TRUE FROM ins
+                    UNION ALL
+                    SELECT id, waktu_scan, status, FALSE FROM {table}
+                    WHERE sesi_id = %s AND siswa_id = %s AND NOT EXISTS (SELECT 1 FROM ins)
+                    """,
+                    [sesi_id, siswa_id, now, status, now, sesi_id, siswa_id],
+                )
+                row = cursor.fetchone()
+            if row is not None:
+                pk, waktu_scan, row_status, created = row
+                return cls(id=pk, sesi_id=sesi_id, siswa_id=siswa_id, waktu_scan=waktu_scan, status=row_status), created
+            # The conflicting row was committed after our snapshot was taken
+            return cls.objects.get(sesi_id=sesi_id, siswa_id=siswa_id), False
+
+        try:
+            with transaction.atomic():
+                return cls.objects.create(sesi_id=sesi_id, siswa_id=siswa_id, status=status), True
+        except IntegrityError:
+            return cls.objects.get(sesi_id=sesi_id, siswa_id=siswa_id), False
+
+    @classmethod
+    def _insert_rows(cls, rows, on_conflict, returning):
+        """Multi-row INSERT of (sesi, siswa, waktu_scan, status, otomatis), returns the RETURNING rows"""
+        now = timezone.now()
+        table = connection.ops.quote_name(cls._meta.db_table)
+        columns = ["sesi_id", "siswa_id", "waktu_scan", "status", "updated_at", "otomatis"]
+        fields = [cls._meta.get_field(column) for column in columns]
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+        params = []
+        for row in rows:
+            # Adapt like the ORM does, e.g. SQLite stores datetimes without a UTC offset
+            params.extend(
+                field.get_db_prep_value(value, connection)
+                for field, value in zip(fields, [row.sesi_id, row.siswa_id, row.waktu_scan, row.status, now, row.otomatis])
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({", ".join(columns)})
+                VALUES {values}
+                {on_conflict.format(table=table)}
+                RETURNING {returning}
+                """,
+                params,
+            )
+            return cursor.fetchall()
+
+    @classmethod
+    def insert_missing(cls, rows):
+        """Insert rows whose (sesi, siswa) has no presensi yet
+
+        Uses INSERT ... ON CONFLICT DO NOTHING RETURNING, so unlike
+        bulk_create(ignore_conflicts=True) the caller learns exactly which
+        rows were inserted. Returns those rows.
+        """
+        if not rows:
+            return []
+        inserted = set(cls._insert_rows(rows, "ON CONFLICT (sesi_id, siswa_id) DO NOTHING", "sesi_id, siswa_id"))
+        return [row for row in rows if (row.sesi_id, row.siswa_id) in inserted]
+
+    @classmethod
+    def insert_or_replace_alpha(cls, rows):
+        """Insert rows like insert_missing, but also overwrite the closer's ALPHA rows
+
+        For scans made while a session was open that reach the server after
+        the closer already marked the student ALPHA. An ALPHA a teacher
+        recorded is kept. Returns (inserted, replaced) lists of rows; other
+        existing rows are left untouched.
+        """
+        if not rows:
+            return [], []
+        pairs = Q()
+        for row in rows:
+            pairs |= Q(sesi_id=row.sesi_id, siswa_id=row.siswa_id)
+        # Lock the ALPHA rows so they are still ALPHA when we overwrite them
+        alpha = set(
+            cls.objects.select_for_update().filter(
+                pairs, status=cls.Status.ALPHA, otomatis=True
+            ).values_list('sesi_id', 'siswa_id')
+        )
+        written = cls._insert_rows(
+            rows,
+            "ON CONFLICT (sesi_id, siswa_id) DO UPDATE SET status = excluded.status, "
+            "waktu_scan = excluded.waktu_scan, updated_at = excluded.updated_at, otomatis = excluded.otomatis "
+            f"WHERE {{table}}.status = '{cls.Status.ALPHA}' AND {{table}}.otomatis",
+            "sesi_id, siswa_id",
+        )
+        inserted, replaced = [], []
+        by_pair = {(row.sesi_id, row.siswa_id): row for row in rows}
+        for pair in written:
+            pair = tuple(pair)
+            (replaced if pair in alpha else inserted).append(by_pair[pair])
+        return inserted, replaced
+
+
+class RiwayatSiswa(models.Model):
+    """Per-student projection of Presensi with the session details flattened
+
+    Kept in sync by readmodel.sync() from every Presensi write path, so the
+    student history and calendar endpoints read one index range.
+    """
+    presensi = models.OneToOneField(Presensi, on_delete=models.CASCADE, primary_key=True, related_name="riwayat")
+    siswa = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="riwayat_presensi")
+    sesi = models.ForeignKey(SesiPresensi, on_delete=models.CASCADE, related_name="riwayat_siswa")
+    kelas_id = models.IntegerField()
+    tanggal = models.DateField()
+    kelas_nama = models.CharField(max_length=120)
+    mata_pelajaran_nama = models.CharField(max_length=100, null=True, blank=True)
+    guru_nama = models.CharField(max_length=200, null=True, blank=True)
+    window_mulai = models.DateTimeField(null=True, blank=True)
+    window_selesai = models.DateTimeField(null=True, blank=True)
+    waktu_scan = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Presensi.Status.choices)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["siswa", "tanggal", "waktu_scan", "presensi"], name="riwayat_siswa_idx"),
+        ]
+
+
+class RekapHarian(models.Model):
+    """Presensi count per (tanggal, kelas, mata_pelajaran, status)
+
+    Updated incrementally by rollup.apply() from every Presensi write path,
+    rebuilt with `manage.py rebuild_rollups`.
+    """
+    tanggal = models.DateField()
+    kelas = models.ForeignKey(Kelas, on_delete=models.CASCADE, related_name="rekap_harian")
+    # No constraint: rows outlive a deleted mapel until the next rebuild
+    mata_pelajaran = models.ForeignKey(
+        MataPelajaran,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="rekap_harian",
+    )
+    status = models.CharField(max_length=10, choices=Presensi.Status.choices)
+    jumlah = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # COALESCE so sessions without a mapel share one row per key too
+            models.UniqueConstraint(
+                "tanggal", "kelas", Coalesce("mata_pelajaran", 0), "status", name="rekap_harian_key"
+            ),
+        ]
+
+
+# SesiPresensi counter column for each presensi status
+COUNTER_FIELDS = {
+    Presensi.Status.HADIR: "jumlah_hadir",
+    Presensi.Status.TERLAMBAT: "jumlah_terlambat",
+    Presensi.Status.IZIN: "jumlah_izin",
+    Presensi.Status.SAKIT: "jumlah_sakit",
+    Presensi.Status.ALPHA: "jumlah_alpha",
+}
+
 
 class LogAudit(models.Model):
     actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="audit_actor")
@@ -0,0 +1,75 @@
+"""
+Maintenance of the RiwayatSiswa projection.
+
+Every Presensi write ends in presensi_written(), which calls sync() for the
+written rows. sync() is one INSERT ... SELECT ... ON CONFLICT DO UPDATE that
+copies the presensi together with its session, kelas, mapel and guru names,
+so the projection never depends on ids or values held in Python. Renames
+of a kelas, mapel or guru are copied with sync_kelas/sync_mapel/sync_guru,
+and `manage.py rebuild_riwayat` re-runs sync() for rows written elsewhere.
+"""
+from django.db import connection
+
+from .models import Presensi, RiwayatSiswa, SesiPresensi
+from apps.classes.models import Kelas, MataPelajaran
+from apps.users.models import User
+
+
+def sync(sesi_ids=None, siswa_ids=None):
+    """Upsert projection rows for these sessions (and students), None means all"""
+    qn = connection.ops.quote_name
+    conditions = ["TRUE"]
+    params = []
+    if sesi_ids is not None:
+        sesi_ids = list(sesi_ids)
+        if not sesi_ids:
+            return
+        conditions.append(f"p.sesi_id IN ({', '.join(['%s'] * len(sesi_ids))})")
+        params.extend(sesi_ids)
+    if siswa_ids is not None:
+        siswa_ids = list(siswa_ids)
+        if not siswa_ids:
+            return
+        conditions.append(f"p.siswa_id IN ({', '.join(['%s'] * len(siswa_ids))})")
+        params.extend(siswa_ids)
+
+    columns = [
+        "presensi_id", "siswa_id", "sesi_id", "kelas_id", "tanggal", "kelas_nama", "mata_pelajaran_nama",
+        "guru_nama", "window_mulai", "window_selesai", "waktu_scan", "status",
+    ]
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {qn(RiwayatSiswa._meta.db_table)} ({", ".join(columns)})
+            SELECT p.id, p.siswa_id, s.id, s.kelas_id, s.tanggal, k.nama, m.nama,
+                   g.name, s.window_mulai, s.window_selesai, p.waktu_scan, p.status
+            FROM {qn(Presensi._meta.db_table)} p
+            JOIN {qn(SesiPresensi._meta.db_table)} s ON s.id = p.sesi_id
+            JOIN {qn(Kelas._meta.db_table)} k ON k.id = s.kelas_id
+            LEFT JOIN {qn(MataPelajaran._meta.db_table)} m ON m.id = s.mata_pelajaran_id
+            LEFT JOIN {qn(User._meta.db_table)} g ON g.id = k.wali_guru_id
+            WHERE {" AND ".join(conditions)}
+            ON CONFLICT (presensi_id) DO UPDATE SET {updates}
+            """,
+            params,
+        )
+
+
+def sync_kelas(kelas):
+    """Copy a renamed class (or its new wali guru) into the projection"""
+    RiwayatSiswa.objects.filter(kelas_id=kelas.id).update(
+        kelas_nama=kelas.nama,
+        guru_nama=kelas.wali_guru.name if kelas.wali_guru else None,
+    )
+
+
+def sync_mapel(mapel):
+    """Copy a renamed mata pelajaran into the projection"""
+    RiwayatSiswa.objects.filter(sesi__mata_pelajaran_id=mapel.id).update(mata_pelajaran_nama=mapel.nama)
+
+
+def sync_guru(user):
+    """Copy a renamed guru into the projection rows of the classes they lead"""
+    kelas_ids = Kelas.objects.filter(wali_guru_id=user.id).values('id')
+    RiwayatSiswa.objects.filter(kelas_id__in=kelas_ids).update(guru_nama=user.name)
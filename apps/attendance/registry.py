@@ -0,0 +1,132 @@
+"""
+Registry of AKTIF attendance sessions for the QR scan hot path.
+
+Entries are keyed by qr_token (and by sesi id for signed rotating tokens,
+see tokens.py) and live in the Django cache (an in-process
+LocMemCache by default) until the session's window_selesai, so a scan can be
+validated and answered without loading SesiPresensi and its relations.
+"""
+import zlib
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone as dj_tz
+
+from .models import SesiPresensi
+from apps.classes.models import SiswaKelas
+
+KEY_PREFIX = "sesi-aktif"
+
+
+def _key(token):
+    return f"{KEY_PREFIX}:{token}"
+
+
+def _id_key(sesi_id):
+    return f"{KEY_PREFIX}:id:{sesi_id}"
+
+
+def build_entry(sesi):
+    """Flatten a session into the fields scan_view needs"""
+    kelas = sesi.kelas
+    return {
+        'sesi_id': sesi.id,
+        'kelas_id': sesi.kelas_id,
+        # Membership is checked against the roster snapshot, like daftar_siswa
+        'expected_ids': frozenset(sesi.expected_ids),
+        'tanggal': sesi.tanggal,
+        'window_mulai': sesi.window_mulai,
+        'window_selesai': sesi.window_selesai,
+        'kelas_nama': kelas.nama,
+        'mata_pelajaran_nama': sesi.mata_pelajaran.nama if sesi.mata_pelajaran else None,
+        'guru_nama': kelas.wali_guru.name if kelas.wali_guru else '-',
+        'jam_mulai': sesi.window_mulai.strftime('%H:%M') if sesi.window_mulai else '-',
+        'jam_selesai': sesi.window_selesai.strftime('%H:%M') if sesi.window_selesai else '-',
+    }
+
+
+def register(sesi):
+    """Cache an AKTIF session until its window closes, return its entry"""
+    if sesi.status != SesiPresensi.Status.AKTIF:
+        unregister(sesi)
+        return None
+
+    entry = build_entry(sesi)
+    ttl = 0
+    if sesi.window_selesai:
+        ttl = (sesi.window_selesai - dj_tz.now()).total_seconds()
+    if ttl > 0:
+        cache.set_many({_key(sesi.qr_token): entry, _id_key(sesi.id): entry}, timeout=ttl)
+    else:
+        unregister(sesi)
+    return entry
+
+
+def unregister(sesi):
+    cache.delete_many([_key(sesi.qr_token), _id_key(sesi.id)])
+
+
+def get(token):
+    """Return the cached entry for token, or None on a miss"""
+    return cache.get(_key(token))
+
+
+def get_by_id(sesi_id):
+    return cache.get(_id_key(sesi_id))
+
+
+def load(**lookup):
+    """Fetch a session with everything build_entry touches in one query"""
+    return SesiPresensi.objects.select_related(
+        'kelas__wali_guru', 'mata_pelajaran'
+    ).get(**lookup)
+
+
+def _scan_key(sesi_id, siswa_id):
+    return f"sesi-scan:{sesi_id}:{siswa_id}"
+
+
+def get_scan(sesi_id, siswa_id):
+    """Return the remembered presensi data if this siswa already scanned"""
+    return cache.get(_scan_key(sesi_id, siswa_id))
+
+
+def remember_scan(sesi_id, siswa_id, window_selesai, data):
+    """Keep a recorded presensi in the session's scanned set until it closes"""
+    if not window_selesai:
+        return
+    ttl = (window_selesai - dj_tz.now()).total_seconds()
+    if ttl > 0:
+        cache.set(_scan_key(sesi_id, siswa_id), dict(data), timeout=ttl)
+
+
+def claim_scan(sesi_id, siswa_id, window_selesai, data):
+    """Atomically add a siswa to the scanned set, False if already there"""
+    ttl = (window_selesai - dj_tz.now()).total_seconds() if window_selesai else 0
+    if ttl <= 0:
+        return True
+    return cache.add(_scan_key(sesi_id, siswa_id), dict(data), timeout=ttl)
+
+
+def forget_scan(sesi_id, siswa_id):
+    cache.delete(_scan_key(sesi_id, siswa_id))
+
+
+def attendance_version(sesi_id):
+    """Return (version, roster_version) for a session, or None if it does not exist
+
+    The version is the newest presensi updated_at in microseconds, so it moves
+    on every attendance write and doubles as the ?since= cursor. Both are read
+    from the database rather than the cache: the cache is per process, and a
+    poll answered by another worker must not get a stale 304.
+    """
+    row = SesiPresensi.objects.filter(id=sesi_id).annotate(
+        latest=Max('presensi_list__updated_at')
+    ).values_list('kelas_id', 'roster_ids', 'latest').first()
+    if row is None:
+        return None
+    kelas_id, roster_ids, latest = row
+    if roster_ids is None:
+        roster_ids = sorted(SiswaKelas.objects.filter(kelas_id=kelas_id).values_list('siswa_id', flat=True))
+    roster_version = zlib.crc32(",".join(map(str, roster_ids)).encode())
+    return int(latest.timestamp() * 1_000_000) if latest else 0, roster_version
@@ -0,0 +1,66 @@
+"""
+Daily attendance rollup (RekapHarian).
+
+apply() folds the status changes of one write into the rollup with a single
+INSERT ... SELECT ... ON CONFLICT DO UPDATE that reads the session's tanggal,
+kelas and mata_pelajaran in the same statement. rebuild() recomputes a date
+range from Presensi, used by `manage.py rebuild_rollups`.
+"""
+from django.db import connection, transaction
+
+from .models import Presensi, RekapHarian, SesiPresensi
+from apps.users import dashboard
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return (
+        qn(RekapHarian._meta.db_table),
+        qn(SesiPresensi._meta.db_table),
+        qn(Presensi._meta.db_table),
+    )
+
+
+def apply(sesi_id, status_deltas):
+    """Add {status: delta} to the rollup rows of one session's day"""
+    status_deltas = {status: delta for status, delta in status_deltas.items() if delta}
+    if not status_deltas:
+        return
+    rekap_table, sesi_table, _ = _tables()
+    values = " UNION ALL ".join(["SELECT %s AS status, %s AS jumlah"] * len(status_deltas))
+    params = [value for item in status_deltas.items() for value in item]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {rekap_table} (tanggal, kelas_id, mata_pelajaran_id, status, jumlah)
+            SELECT s.tanggal, s.kelas_id, s.mata_pelajaran_id, v.status, v.jumlah
+            FROM {sesi_table} s, ({values}) v
+            WHERE s.id = %s
+            ON CONFLICT (tanggal, kelas_id, COALESCE(mata_pelajaran_id, 0), status)
+            DO UPDATE SET jumlah = {rekap_table}.jumlah + excluded.jumlah
+            """,
+            [*params, sesi_id],
+        )
+    # The admin dashboard reads today's attendance from the rollup
+    dashboard.forget()
+
+
+def rebuild(date_from, date_to):
+    """Recompute the rollup for tanggal in [date_from, date_to], return rows written"""
+    rekap_table, sesi_table, presensi_table = _tables()
+    with transaction.atomic():
+        RekapHarian.objects.filter(tanggal__gte=date_from, tanggal__lte=date_to).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {rekap_table} (tanggal, kelas_id, mata_pelajaran_id, status, jumlah)
+                SELECT s.tanggal, s.kelas_id, s.mata_pelajaran_id, p.status, COUNT(*)
+                FROM {presensi_table} p
+                JOIN {sesi_table} s ON s.id = p.sesi_id
+                WHERE s.tanggal >= %s AND s.tanggal <= %s
+                GROUP BY s.tanggal, s.kelas_id, s.mata_pelajaran_id, p.status
+                """,
+                [date_from, date_to],
+            )
+            dashboard.forget()
+            return cursor.rowcount
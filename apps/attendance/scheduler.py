@@ -0,0 +1,36 @@
+"""
+In-process scheduler that closes overdue AKTIF sessions.
+
+Dashboards that list active sessions call sweep_if_due() first. At most one
+request per SESSION_SWEEP_SECONDS (per cache) wins the slot and runs
+closer.close_overdue(), which moves every overdue session to SELESAI in one
+UPDATE and runs the end-of-session hooks. Deployments without steady traffic
+can run `manage.py close_overdue_sessions --every 60` instead.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import closer
+
+logger = logging.getLogger(__name__)
+
+SWEEP_KEY = "sesi-sweep"
+
+
+def sweep_if_due(now=None):
+    """Close overdue sessions unless another request did so recently
+
+    Returns the number of sessions closed by this call.
+    """
+    interval = settings.SESSION_SWEEP_SECONDS
+    if interval <= 0 or not cache.add(SWEEP_KEY, 1, timeout=interval):
+        return 0
+    try:
+        closed, _ = closer.close_overdue(now)
+    except Exception:
+        # Never fail the dashboard request, the next slot retries
+        logger.exception("Closing overdue sessions failed")
+        return 0
+    return closed
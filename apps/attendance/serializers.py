@@ -22,8 +22,17 @@ class SesiPresensiSerializer(serializers.ModelSerializer):
             "qr_token",
             "status",
             "created_at",
+            "jumlah_hadir",
+            "jumlah_terlambat",
+            "jumlah_izin",
+            "jumlah_sakit",
+            "jumlah_alpha",
+            "roster_size",
+        ]
+        read_only_fields = [
+            "qr_token", "status", "created_at",
+            "jumlah_hadir", "jumlah_terlambat", "jumlah_izin", "jumlah_sakit", "jumlah_alpha", "roster_size",
         ]
-        read_only_fields = ["qr_token", "status", "created_at"]
 
 
 class PresensiSerializer(serializers.ModelSerializer):
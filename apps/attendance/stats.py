@@ -0,0 +1,113 @@
+"""
+Per-student monthly attendance stats for the siswa dashboard.
+
+Stats are computed with one conditional aggregation and cached per student
+and month. presensi_written() then adjusts cached entries in place, so a
+scan followed by a dashboard load stays a cache hit. Closing, re-opening or
+deleting a session changes the monthly total for its whole roster, so those
+entries are dropped instead.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, FilteredRelation, Q
+
+from . import registry
+from .models import Presensi, SesiPresensi
+
+# Writes update the entries of the worker that made them; the local-memory
+# cache is per process, so other workers catch up within this many seconds
+STATS_TTL = 60
+
+
+def _key(siswa_id, tanggal):
+    return f"siswa-stats:{siswa_id}:{tanggal:%Y-%m}"
+
+
+def compute(siswa_id, today):
+    """Monthly counts and today's status for a student, in two queries"""
+    totals = SesiPresensi.objects.filter(
+        kelas__anggota__siswa_id=siswa_id,
+        tanggal__gte=today.replace(day=1),
+        tanggal__lte=today,
+    ).annotate(
+        presensi=FilteredRelation('presensi_list', condition=Q(presensi_list__siswa_id=siswa_id)),
+    ).aggregate(
+        total=Count('id', filter=Q(status=SesiPresensi.Status.SELESAI)),
+        present=Count('presensi__id', filter=Q(presensi__status=Presensi.Status.HADIR)),
+        late=Count('presensi__id', filter=Q(presensi__status=Presensi.Status.TERLAMBAT)),
+    )
+    # Today's status is that of the latest record, not the largest status value
+    latest = Presensi.objects.filter(siswa_id=siswa_id, sesi__tanggal=today).order_by(
+        '-waktu_scan', '-id'
+    ).values_list('status', 'waktu_scan').first()
+    totals['today_status'], totals['today_waktu_scan'] = latest or (None, None)
+    totals['today'] = today
+    return totals
+
+
+def get(siswa_id, today=None):
+    today = today or date.today()
+    key = _key(siswa_id, today)
+    entry = cache.get(key)
+    if entry is None:
+        entry = compute(siswa_id, today)
+        cache.add(key, entry, timeout=STATS_TTL)
+    if entry['today'] != today:
+        # Cached on an earlier day and nothing was written since
+        entry = {**entry, 'today': today, 'today_status': None, 'today_waktu_scan': None}
+    return entry
+
+
+def apply(sesi_id, rows, previous=None, tanggal=None):
+    """Fold written Presensi rows into the cached entries once committed"""
+    rows = [(row.siswa_id, row.status, row.waktu_scan) for row in rows]
+    previous = previous or {}
+
+    def update():
+        sesi_tanggal = tanggal
+        if sesi_tanggal is None:
+            entry = registry.get_by_id(sesi_id)
+            if entry is not None:
+                sesi_tanggal = entry['tanggal']
+            else:
+                sesi_tanggal = SesiPresensi.objects.filter(id=sesi_id).values_list('tanggal', flat=True).first()
+        if sesi_tanggal is None:
+            return
+
+        keys = {siswa_id: _key(siswa_id, sesi_tanggal) for siswa_id, _, _ in rows}
+        cached = cache.get_many(keys.values())
+        changed = {}
+        for siswa_id, status_value, waktu_scan in rows:
+            key = keys[siswa_id]
+            if key not in cached:
+                continue
+            entry = changed.get(key) or dict(cached[key])
+            old_status = previous.get(siswa_id)
+            entry['present'] += (status_value == Presensi.Status.HADIR) - (old_status == Presensi.Status.HADIR)
+            entry['late'] += (status_value == Presensi.Status.TERLAMBAT) - (old_status == Presensi.Status.TERLAMBAT)
+            if sesi_tanggal == date.today():
+                if entry['today'] != sesi_tanggal:
+                    entry['today'], entry['today_status'], entry['today_waktu_scan'] = sesi_tanggal, None, None
+                # Only a record at least as recent as the cached one sets today's status
+                if entry.get('today_waktu_scan') is None or waktu_scan >= entry['today_waktu_scan']:
+                    entry['today_status'] = status_value
+                    entry['today_waktu_scan'] = waktu_scan
+            changed[key] = entry
+        if changed:
+            cache.set_many(changed, timeout=STATS_TTL)
+
+    transaction.on_commit(update)
+
+
+def forget(siswa_ids, tanggal=None):
+    """Drop cached entries, e.g. after the monthly session total changed"""
+    tanggal = tanggal or date.today()
+    keys = [_key(siswa_id, tanggal) for siswa_id in siswa_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_session(sesi):
+    """Drop the entries of everyone expected in this session"""
+    forget(sesi.expected_ids, sesi.tanggal)
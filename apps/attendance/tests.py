@@ -0,0 +1,84 @@
+import os
+import tempfile
+from datetime import date
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import ingest
+from .models import Presensi, SesiPresensi
+from apps.classes.models import Kelas, SiswaKelas
+from apps.users.models import User
+
+
+class ScanSpoolFlushTests(TransactionTestCase):
+    """Flushing the write-behind spool (ingest.flush) into Presensi"""
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(
+            SCAN_INGEST_MODE="batched",
+            SCAN_SPOOL_PATH=os.path.join(spool_dir.name, "spool.sqlite3"),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The spool connection is per thread; open a fresh one on the new path
+        ingest._local.conn = None
+        self.addCleanup(lambda: setattr(ingest._local, "conn", None))
+
+        self.siswa = User.objects.create(username="siswa1", email="siswa1@example.com", role=User.Role.SISWA)
+        kelas = Kelas.objects.create(nama="X-1", tahun_ajaran="2026/2027")
+        SiswaKelas.objects.create(siswa=self.siswa, kelas=kelas)
+        self.sesi = SesiPresensi.objects.create(
+            kelas=kelas, tanggal=date.today(), qr_token="spool-test", status=SesiPresensi.Status.AKTIF
+        )
+
+    def _spool(self, sesi_id, siswa_id):
+        # Straight into the spool, so the background flusher is not started
+        ingest._spool().execute(
+            "INSERT INTO spool (sesi_id, siswa_id, status, waktu_scan) VALUES (?, ?, ?, ?)",
+            (sesi_id, siswa_id, Presensi.Status.HADIR, timezone.now().isoformat()),
+        )
+
+    def _spooled(self):
+        return ingest._spool().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def test_scan_for_deleted_session_does_not_block_the_spool(self):
+        deleted = SesiPresensi.objects.create(
+            kelas=self.sesi.kelas, tanggal=date.today(), qr_token="spool-deleted"
+        )
+        self._spool(deleted.id, self.siswa.id)
+        self._spool(self.sesi.id, self.siswa.id)
+        deleted.delete()
+
+        self.assertEqual(ingest.flush(), 2)
+
+        self.assertEqual(self._spooled(), 0)
+        self.assertEqual(list(Presensi.objects.values_list("sesi_id", "siswa_id")), [(self.sesi.id, self.siswa.id)])
+        self.sesi.refresh_from_db()
+        self.assertEqual(self.sesi.jumlah_hadir, 1)
+
+    def test_scan_for_unknown_siswa_is_dropped(self):
+        self._spool(self.sesi.id, 999999)
+
+        self.assertEqual(ingest.flush(), 1)
+
+        self.assertEqual(self._spooled(), 0)
+        self.assertFalse(Presensi.objects.exists())
+
+    def test_rolled_back_flush_keeps_the_spool(self):
+        self._spool(self.sesi.id, self.siswa.id)
+
+        with self.assertRaises(RuntimeError):
+            # e.g. closer.finalize() failing after it flushed the session
+            with transaction.atomic():
+                ingest.flush(sesi_id=self.sesi.id)
+                raise RuntimeError
+
+        self.assertEqual(self._spooled(), 1)
+        self.assertFalse(Presensi.objects.exists())
+        self.assertEqual(ingest.flush(), 1)
+        self.assertEqual(self._spooled(), 0)
+        self.assertTrue(Presensi.objects.filter(sesi=self.sesi, siswa=self.siswa).exists())
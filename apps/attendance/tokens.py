@@ -0,0 +1,74 @@
+"""
+Signed, rotating QR tokens for SesiPresensi.
+
+A token reads "<sesi_id>.<slot>.<mulai>.<selesai>.<signature>": slot is the
+current QR_TOKEN_ROTATE_SECONDS interval, mulai/selesai are the session window
+as epoch seconds and the signature is an HMAC of the other parts keyed by
+SECRET_KEY. scan_view verifies it in pure Python, so forged, stale and
+out-of-window tokens are rejected without touching the database. The random
+qr_token column is still accepted for older clients.
+"""
+import base64
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils import timezone as dj_tz
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = "apps.attendance.tokens"
+# A token stays valid for the slot it was issued in and the one after it
+GRACE_SLOTS = 1
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def is_signed(token):
+    # token_urlsafe never produces dots, signed tokens always do
+    return "." in token
+
+
+def _slot(now):
+    return int(now.timestamp()) // settings.QR_TOKEN_ROTATE_SECONDS
+
+
+def _sign(payload):
+    digest = salted_hmac(SALT, payload, algorithm="sha256").digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue(sesi, now=None):
+    """Return (token, expires_at) for the current rotation slot"""
+    now = now or dj_tz.now()
+    slot = _slot(now)
+    payload = f"{sesi.id}.{slot}.{int(sesi.window_mulai.timestamp())}.{int(sesi.window_selesai.timestamp())}"
+    expires_at = datetime.fromtimestamp((slot + 1) * settings.QR_TOKEN_ROTATE_SECONDS, tz=timezone.utc)
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def verify(token, now=None):
+    """Check signature and rotation slot, return the token's claims
+
+    Raises InvalidToken for malformed or forged tokens and ExpiredToken for
+    tokens from an older rotation slot.
+    """
+    now = now or dj_tz.now()
+    try:
+        payload, signature = token.rsplit(".", 1)
+        sesi_id, slot, mulai, selesai = (int(part) for part in payload.split("."))
+    except ValueError:
+        raise InvalidToken(token)
+    if not constant_time_compare(signature, _sign(payload)):
+        raise InvalidToken(token)
+    if not 0 <= _slot(now) - slot <= GRACE_SLOTS:
+        raise ExpiredToken(token)
+    return {
+        'sesi_id': sesi_id,
+        'window_mulai': datetime.fromtimestamp(mulai, tz=timezone.utc),
+        'window_selesai': datetime.fromtimestamp(selesai, tz=timezone.utc),
+    }
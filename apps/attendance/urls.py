@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SesiViewSet, scan_view, siswa_statistics, siswa_riwayat, siswa_riwayat_detail
+from .views import (
+    SesiViewSet, scan_view, scan_batch_view, siswa_statistics, siswa_riwayat, siswa_riwayat_detail, siswa_kalender, kelas_rekap,
+)
 
 router = DefaultRouter()
 router.register(r"sesi", SesiViewSet, basename="sesi")
@@ -8,7 +10,10 @@ router.register(r"sesi", SesiViewSet, basename="sesi")
 urlpatterns = [
     path("", include(router.urls)),
     path("scan", scan_view, name="scan"),
+    path("scan/batch", scan_batch_view, name="scan-batch"),
     path("siswa/statistics/", siswa_statistics, name="siswa-statistics"),
     path("siswa/riwayat/", siswa_riwayat, name="siswa-riwayat"),
     path("siswa/riwayat/<int:presensi_id>/", siswa_riwayat_detail, name="siswa-riwayat-detail"),
+    path("siswa/kalender/", siswa_kalender, name="siswa-kalender"),
+    path("rekap/kelas/<int:kelas_id>/", kelas_rekap, name="kelas-rekap"),
 ]
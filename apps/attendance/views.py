@@ -1,18 +1,47 @@
+import queue
 import secrets
+import time
 from datetime import datetime, timezone, date
 
+from django.conf import settings
 from django.utils import timezone as dj_tz
-from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
+from django.db import close_old_connections, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.db.models import FilteredRelation, Q
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from .models import SesiPresensi, Presensi
+from . import analytics, closer, events, ingest, readmodel, registry, rollup, scheduler, stats, tokens
+from .models import COUNTER_FIELDS, SesiPresensi, Presensi, RiwayatSiswa
 from .serializers import SesiPresensiSerializer, PresensiSerializer
-from apps.classes.models import Kelas, SiswaKelas
+from .writes import presensi_written
+from apps.classes import dashboard as guru_dashboard
+from apps.classes.models import Kelas
 from apps.users.permissions import IsGuru, IsSiswa
-from apps.users.models import User
+from apps.users.models import Settings, User
+from slador_backend.pagination import KeysetPagination
+
+
+# Overlap applied to daftar_siswa ?since= cursors
+DELTA_OVERLAP = dj_tz.timedelta(seconds=2)
+
+
+class RiwayatPagination(KeysetPagination):
+    ordering = ('-tanggal', '-id')
+
+
+class RiwayatSiswaPagination(KeysetPagination):
+    ordering = ('-tanggal', '-waktu_scan', '-presensi_id')
+
+
+class KalenderPagination(KeysetPagination):
+    ordering = ('tanggal', 'waktu_scan', 'presensi_id')
+    page_size = 100
 
 
 class SesiViewSet(viewsets.ModelViewSet):
@@ -20,6 +49,13 @@ class SesiViewSet(viewsets.ModelViewSet):
     serializer_class = SesiPresensiSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            # Nested kelas_detail / mata_pelajaran_detail for a whole page
+            qs = qs.select_related("kelas__wali_guru", "mata_pelajaran__guru")
+        return qs
+
     def create(self, request, *args, **kwargs):
         # Generate unique token
         qr_token = secrets.token_urlsafe(24)
@@ -34,7 +70,7 @@ class SesiViewSet(viewsets.ModelViewSet):
             return Response({"detail": "kelas required"}, status=400)
         
         try:
-            kelas = Kelas.objects.get(id=kelas_id)
+            kelas = Kelas.objects.select_related('wali_guru').get(id=kelas_id)
         except Kelas.DoesNotExist:
             return Response({"detail": "kelas not found"}, status=404)
         
@@ -59,8 +95,8 @@ class SesiViewSet(viewsets.ModelViewSet):
             except Jadwal.DoesNotExist:
                 pass
         
-        # Create sesi
-        sesi = SesiPresensi.objects.create(
+        # Create sesi with a frozen copy of the roster
+        sesi = SesiPresensi(
             kelas=kelas,
             jadwal=jadwal,
             mata_pelajaran=mata_pelajaran,
@@ -70,6 +106,10 @@ class SesiViewSet(viewsets.ModelViewSet):
             window_mulai=now,
             window_selesai=now + dj_tz.timedelta(hours=1)
         )
+        sesi.snapshot_roster()
+        sesi.save()
+        registry.register(sesi)
+        guru_dashboard.forget_kelas([sesi.kelas_id])
         
         # Build response
         response_data = {
@@ -92,6 +132,40 @@ class SesiViewSet(viewsets.ModelViewSet):
         
         return Response(response_data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        previous_kelas_id = instance.kelas_id
+        moved = any(
+            field in serializer.validated_data and serializer.validated_data[field] != getattr(instance, field)
+            for field in ("tanggal", "kelas", "mata_pelajaran")
+        )
+        counts = {status_value: getattr(instance, field) for status_value, field in COUNTER_FIELDS.items()}
+        with transaction.atomic():
+            if moved:
+                # Take the counts out under the stored day/kelas/mapel, add them back under the new one
+                rollup.apply(instance.id, {status_value: -count for status_value, count in counts.items()})
+            sesi = serializer.save()
+            if moved:
+                rollup.apply(sesi.id, counts)
+        registry.register(sesi)
+        # Mapel or date changes show up in the students' history
+        readmodel.sync([sesi.id])
+        guru_dashboard.forget_kelas([previous_kelas_id, sesi.kelas_id])
+
+    def perform_destroy(self, instance):
+        registry.unregister(instance)
+        stats.forget_session(instance)
+        with transaction.atomic():
+            # Take the session's presensi back out of the daily rollup
+            rollup.apply(instance.id, {
+                status_value: -getattr(instance, field) for status_value, field in COUNTER_FIELDS.items()
+            })
+            instance.delete()
+            # Spooled scans of the session could never be written now
+            sesi_id = instance.id
+            transaction.on_commit(lambda: ingest.discard(sesi_id))
+        guru_dashboard.forget_kelas([instance.kelas_id])
+
     @action(detail=True, methods=["patch"], permission_classes=[IsAuthenticated])
     def aktif(self, request, pk=None):
         sesi = self.get_object()
@@ -99,44 +173,177 @@ class SesiViewSet(viewsets.ModelViewSet):
         window_selesai = request.data.get("window_selesai")
         if not (window_mulai and window_selesai):
             return Response({"detail": "window_mulai & window_selesai required"}, status=400)
+        if sesi.status == SesiPresensi.Status.SELESAI:
+            # Re-opening takes the session out of its members' monthly totals
+            stats.forget_session(sesi)
         sesi.window_mulai = window_mulai
         sesi.window_selesai = window_selesai
         sesi.status = SesiPresensi.Status.AKTIF
-        sesi.save(update_fields=["window_mulai", "window_selesai", "status"])
+        sesi.snapshot_roster()
+        sesi.save(update_fields=["window_mulai", "window_selesai", "status", "roster_ids", "roster_size"])
+        # Reload so the window bounds are datetimes, not request strings
+        sesi.refresh_from_db(fields=["window_mulai", "window_selesai"])
+        registry.register(sesi)
+        # The new window shows up in the students' history
+        readmodel.sync([sesi.id])
+        guru_dashboard.forget_kelas([sesi.kelas_id])
         return Response(self.get_serializer(sesi).data)
     
     @action(detail=True, methods=["patch"], permission_classes=[IsAuthenticated])
     def selesai(self, request, pk=None):
         """End active session"""
         sesi = self.get_object()
-        sesi.status = SesiPresensi.Status.SELESAI
-        sesi.save(update_fields=["status"])
+        with transaction.atomic():
+            sesi.status = SesiPresensi.Status.SELESAI
+            sesi.save(update_fields=["status"])
+            registry.unregister(sesi)
+            # Flush spooled scans, then mark everyone still missing as ALPHA
+            closer.finalize([sesi.id])
         return Response(self.get_serializer(sesi).data)
     
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
-    def daftar_siswa(self, request, pk=None):
-        """Get list of students in this session with their attendance status"""
+    def qr(self, request, pk=None):
+        """Get the current rotating QR token for an active session (wali guru or admin only)"""
         sesi = self.get_object()
+        # Anyone else holding a fresh token could scan from anywhere
+        if request.user.role != User.Role.ADMIN and sesi.kelas.wali_guru_id != request.user.id:
+            return Response({"detail": "Hanya wali kelas atau admin"}, status=403)
+        if sesi.status != SesiPresensi.Status.AKTIF or not (sesi.window_mulai and sesi.window_selesai):
+            return Response({"detail": "sesi tidak aktif"}, status=400)
+        token, expires_at = tokens.issue(sesi)
+        return Response({
+            'token': token,
+            'expires_at': expires_at,
+            'rotate_seconds': settings.QR_TOKEN_ROTATE_SECONDS,
+        })
+    
+    def _daftar_siswa_rows(self, sesi):
+        # One LEFT JOIN of the session's roster snapshot against its presensi
+        rows = User.objects.filter(id__in=sesi.expected_ids).annotate(
+            presensi=FilteredRelation(
+                'presensi_siswa', condition=Q(presensi_siswa__sesi_id=sesi.id)
+            ),
+        ).values(
+            'id', 'name', 'nim', 'email',
+            'presensi__id', 'presensi__status', 'presensi__waktu_scan',
+        ).order_by('name', 'id')
         
-        # Get all students in this kelas
-        siswa_kelas = SiswaKelas.objects.filter(kelas=sesi.kelas).select_related('siswa')
-        
-        result = []
-        for sk in siswa_kelas:
-            # Check if student already has attendance record
-            presensi = Presensi.objects.filter(sesi=sesi, siswa=sk.siswa).first()
-            
-            result.append({
-                'siswa_id': sk.siswa.id,
-                'nama': sk.siswa.name,
-                'nim': getattr(sk.siswa, 'nim', None),
-                'email': sk.siswa.email,
-                'status': presensi.status if presensi else None,
-                'waktu_scan': presensi.waktu_scan if presensi else None,
-                'sudah_presensi': presensi is not None
-            })
-        
-        return Response(result)
+        return [{
+            'siswa_id': row['id'],
+            'nama': row['name'],
+            'nim': row['nim'],
+            'email': row['email'],
+            'status': row['presensi__status'],
+            'waktu_scan': row['presensi__waktu_scan'],
+            'sudah_presensi': row['presensi__id'] is not None
+        } for row in rows]
+
+    def _changed_rows(self, sesi, since):
+        # Small overlap so clock skew between workers never hides a write
+        changed_after = datetime.fromtimestamp(since / 1_000_000, tz=timezone.utc) - DELTA_OVERLAP
+        rows = Presensi.objects.filter(sesi=sesi, updated_at__gt=changed_after).values(
+            'siswa_id', 'siswa__name', 'siswa__nim', 'siswa__email', 'status', 'waktu_scan',
+        )
+        return [{
+            'siswa_id': row['siswa_id'],
+            'nama': row['siswa__name'],
+            'nim': row['siswa__nim'],
+            'email': row['siswa__email'],
+            'status': row['status'],
+            'waktu_scan': row['waktu_scan'],
+            'sudah_presensi': True
+        } for row in rows]
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def daftar_siswa(self, request, pk=None):
+        """Get list of students in this session with their attendance status
+
+        Responses carry an ETag built from the session's attendance version, so
+        an unchanged poll gets a 304 after one aggregate query.
+        ?since=<version> returns only the rows written after that version.
+        """
+        since = request.query_params.get('since')
+        if since is not None and not since.isdigit():
+            return Response({'detail': 'since must be a version number'}, status=400)
+
+        state = registry.attendance_version(pk) if str(pk).isdigit() else None
+        if state is None:
+            raise Http404
+        version, roster_version = state
+        etag = f'"{pk}.{version}.{roster_version}{"." + since if since else ""}"'
+        headers = {'ETag': etag, 'X-Attendance-Version': str(version)}
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers=headers)
+
+        sesi = self.get_object()
+        if since:
+            data = {'version': version, 'siswa': self._changed_rows(sesi, int(since))}
+        else:
+            data = self._daftar_siswa_rows(sesi)
+        return Response(data, headers=headers)
+    
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def stream_token(self, request, pk=None):
+        """Short-lived token for opening the stream with a browser EventSource"""
+        sesi = self.get_object()
+        token = events.issue_stream_token(sesi.id, request.user.id)
+        url = request.build_absolute_uri(reverse('sesi-stream', args=[sesi.id]))
+        return Response({
+            'token': token,
+            'expires_in': events.STREAM_TOKEN_SECONDS,
+            'url': f"{url}?stream_token={token}",
+        })
+    
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        authentication_classes=[*api_settings.DEFAULT_AUTHENTICATION_CLASSES, events.StreamTokenAuthentication],
+        renderer_classes=[events.EventStreamRenderer],
+    )
+    def stream(self, request, pk=None):
+        """Server-Sent Events: a daftar_siswa snapshot, then every attendance write
+
+        Accepts the usual Bearer header, or ?stream_token= from stream_token
+        since EventSource cannot set headers.
+        """
+        sesi = self.get_object()
+        if isinstance(request.auth, dict) and request.auth.get('sesi_id') != sesi.id:
+            return Response({'detail': 'stream token untuk sesi lain'}, status=403)
+        broker = events.get_broker()
+        channel = events.channel(sesi.id)
+
+        def event_stream():
+            # Subscribe before taking the snapshot so no write falls in between
+            subscriber = broker.subscribe(channel)
+            try:
+                snapshot = {'sesi_id': sesi.id, 'status': sesi.status, 'siswa': self._daftar_siswa_rows(sesi)}
+                # The stream itself never touches the database
+                close_old_connections()
+                yield b"retry: 3000\n\n"
+                yield events.format_sse('snapshot', snapshot, 0)
+                if sesi.status == SesiPresensi.Status.SELESAI:
+                    return
+
+                seq = 0
+                deadline = time.monotonic() + events.MAX_STREAM_SECONDS
+                while time.monotonic() < deadline:
+                    try:
+                        event = subscriber.get(timeout=events.HEARTBEAT_SECONDS)
+                    except queue.Empty:
+                        yield b": ping\n\n"
+                        continue
+                    seq += 1
+                    yield events.format_sse(event['type'], event, seq)
+                    if event['type'] == 'closed':
+                        return
+            finally:
+                broker.unsubscribe(channel, subscriber)
+
+        response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
     
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def manual_presensi(self, request, pk=None):
@@ -163,16 +370,22 @@ class SesiViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'error': 'Siswa not found'}, status=404)
         
-        # Check if siswa is in this kelas
-        if not SiswaKelas.objects.filter(kelas=sesi.kelas, siswa=siswa).exists():
+        # Check if siswa is expected in this session (its roster snapshot)
+        if siswa.id not in sesi.expected_ids:
             return Response({'error': 'Siswa not in this class'}, status=403)
         
-        # Create or update presensi
-        presensi, created = Presensi.objects.update_or_create(
-            sesi=sesi,
-            siswa=siswa,
-            defaults={'status': status}
-        )
+        # Create or update presensi, keeping the old status for the counters
+        with transaction.atomic():
+            previous = dict(
+                Presensi.objects.select_for_update().filter(sesi=sesi, siswa=siswa).values_list('siswa_id', 'status')
+            )
+            presensi, created = Presensi.objects.update_or_create(
+                sesi=sesi,
+                siswa=siswa,
+                defaults={'status': status, 'otomatis': False}
+            )
+            presensi_written(sesi.id, [presensi], previous=previous, tanggal=sesi.tanggal)
+        registry.forget_scan(sesi.id, siswa.id)
         
         return Response({
             'id': presensi.id,
@@ -184,20 +397,108 @@ class SesiViewSet(viewsets.ModelViewSet):
             'message': 'Presensi berhasil direkam' if created else 'Presensi berhasil diupdate'
         })
     
+    @action(detail=True, methods=["post"], url_path="manual_presensi/bulk", permission_classes=[IsAuthenticated])
+    def manual_presensi_bulk(self, request, pk=None):
+        """Record attendance for many students of this session at once
+
+        Body: {"records": [{"siswa_id": .., "status": ..}], "others": "ALPHA"}.
+        "others" is optional and marks every other expected member who has no
+        presensi yet. Membership is checked against the session's roster
+        snapshot and all changes are applied with one bulk upsert in a single
+        transaction.
+        """
+        sesi = self.get_object()
+        records = request.data.get('records', [])
+        others = request.data.get('others')
+        valid_statuses = [s[0] for s in Presensi.Status.choices]
+        
+        if not isinstance(records, list):
+            return Response({'error': 'records must be a list'}, status=400)
+        if others is not None and others not in valid_statuses:
+            return Response({'error': f'Invalid others status. Must be one of: {valid_statuses}'}, status=400)
+        
+        wanted = {}
+        for record in records:
+            try:
+                siswa_id = int(record.get('siswa_id'))
+            except (AttributeError, TypeError, ValueError):
+                return Response({'error': 'siswa_id required', 'record': record}, status=400)
+            status_value = record.get('status', 'HADIR')
+            if status_value not in valid_statuses:
+                return Response({'error': f'Invalid status. Must be one of: {valid_statuses}', 'record': record}, status=400)
+            wanted[siswa_id] = status_value
+        if not wanted and not others:
+            return Response({'error': 'records or others required'}, status=400)
+        
+        members = sesi.expected_ids
+        outsiders = sorted(set(wanted) - members)
+        if outsiders:
+            return Response({'error': 'Siswa not in this class', 'siswa_ids': outsiders}, status=403)
+        
+        with transaction.atomic():
+            existing = {
+                siswa_id: (status_value, waktu_scan, otomatis)
+                for siswa_id, status_value, waktu_scan, otomatis in Presensi.objects.select_for_update().filter(
+                    sesi=sesi
+                ).values_list('siswa_id', 'status', 'waktu_scan', 'otomatis')
+            }
+            if others:
+                for siswa_id in members:
+                    if siswa_id not in wanted and siswa_id not in existing:
+                        wanted[siswa_id] = others
+            
+            rows = []
+            for siswa_id, status_value in wanted.items():
+                # A closer ALPHA confirmed by the teacher is rewritten as theirs
+                if siswa_id in existing and existing[siswa_id][0] == status_value and not existing[siswa_id][2]:
+                    continue
+                row = Presensi(sesi=sesi, siswa_id=siswa_id, status=status_value)
+                if siswa_id in existing:
+                    # Only status is updated on conflict, the scan time stays
+                    row.waktu_scan = existing[siswa_id][1]
+                rows.append(row)
+            Presensi.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['sesi', 'siswa'],
+                update_fields=['status', 'updated_at', 'otomatis'],
+            )
+            presensi_written(sesi.id, rows, previous={
+                siswa_id: status_value for siswa_id, (status_value, _, _) in existing.items()
+            }, tanggal=sesi.tanggal)
+        
+        for row in rows:
+            registry.forget_scan(sesi.id, row.siswa_id)
+        
+        created = sum(1 for row in rows if row.siswa_id not in existing)
+        return Response({
+            'created': created,
+            'updated': len(rows) - created,
+            'unchanged': len(wanted) - len(rows),
+            'results': [{
+                'siswa_id': row.siswa_id,
+                'status': row.status,
+                'waktu_scan': row.waktu_scan,
+                'created': row.siswa_id not in existing
+            } for row in rows],
+            'message': f'{len(rows)} presensi berhasil disimpan'
+        })
+    
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def aktif_sesi(self, request):
         """Get currently active session for current user"""
+        scheduler.sweep_if_due()
         # Get active session for guru
         sesi = SesiPresensi.objects.filter(
             status=SesiPresensi.Status.AKTIF,
             kelas__wali_guru=request.user
-        ).first()
+        ).select_related('kelas', 'mata_pelajaran').first()
         
         if not sesi:
             return Response(None)
         
-        # Add jumlah hadir
-        jumlah_hadir = sesi.presensi_list.count()
+        # Add jumlah hadir from the session counters
+        jumlah_hadir = sesi.jumlah_presensi
         data = self.get_serializer(sesi).data
         data['jumlah_hadir'] = jumlah_hadir
         data['kelas_nama'] = sesi.kelas.nama
@@ -209,33 +510,52 @@ class SesiViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def riwayat(self, request):
-        """Get session history"""
+        """Get session history, newest first, one keyset page at a time
+
+        Filters: ?filter=week|month|all, or ?start_date=&end_date= (YYYY-MM-DD),
+        plus ?kelas=<id> and ?mata_pelajaran=<id>. Follow "next" for older
+        sessions; ?page_size= sets the page length.
+        """
         filter_param = request.query_params.get('filter', 'week')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
         
         qs = SesiPresensi.objects.filter(
             status=SesiPresensi.Status.SELESAI,
             kelas__wali_guru=request.user
-        ).select_related('kelas')
+        ).select_related('kelas', 'mata_pelajaran')
         
         # Filter by date range
-        today = date.today()
-        if filter_param == 'week':
-            start_date = today - dj_tz.timedelta(days=7)
-            qs = qs.filter(tanggal__gte=start_date)
-        elif filter_param == 'month':
-            start_date = today - dj_tz.timedelta(days=30)
-            qs = qs.filter(tanggal__gte=start_date)
+        if start_date or end_date:
+            try:
+                if start_date:
+                    qs = qs.filter(tanggal__gte=date.fromisoformat(start_date))
+                if end_date:
+                    qs = qs.filter(tanggal__lte=date.fromisoformat(end_date))
+            except ValueError:
+                return Response({'detail': 'start_date/end_date harus YYYY-MM-DD'}, status=400)
+        else:
+            today = date.today()
+            if filter_param == 'week':
+                qs = qs.filter(tanggal__gte=today - dj_tz.timedelta(days=7))
+            elif filter_param == 'month':
+                qs = qs.filter(tanggal__gte=today - dj_tz.timedelta(days=30))
         
-        # Annotate with counts
-        qs = qs.annotate(
-            hadir_count=Count('presensi_list', filter=Q(presensi_list__status='HADIR'))
-        )
+        for param, field in (('kelas', 'kelas_id'), ('mata_pelajaran', 'mata_pelajaran_id')):
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({'detail': f'{param} harus berupa id'}, status=400)
+                qs = qs.filter(**{field: int(value)})
         
-        # Build response
+        paginator = RiwayatPagination()
+        page = paginator.paginate_queryset(qs, request)
+        
+        # Build response from the session counters
         result = []
-        for sesi in qs[:50]:  # Limit to 50 recent sessions
-            total_siswa = SiswaKelas.objects.filter(kelas=sesi.kelas).count()
-            hadir = sesi.hadir_count
+        for sesi in page:
+            total_siswa = sesi.roster_size
+            hadir = sesi.jumlah_hadir
             tidak_hadir = total_siswa - hadir
             persentase = (hadir / total_siswa * 100) if total_siswa > 0 else 0
             
@@ -252,94 +572,52 @@ class SesiViewSet(viewsets.ModelViewSet):
                 'persentase_kehadiran': round(persentase, 1)
             })
         
-        return Response(result)
+        return paginator.get_paginated_response(result)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def siswa_statistics(request):
-    """Get statistics for siswa dashboard"""
-    user = request.user
-    today = date.today()
-    
-    # Get kelas siswa
-    kelas_ids = SiswaKelas.objects.filter(siswa=user).values_list('kelas_id', flat=True)
-    
-    # Status hari ini
-    today_presensi = Presensi.objects.filter(
-        siswa=user,
-        sesi__tanggal=today,
-        sesi__kelas_id__in=kelas_ids
-    ).first()
-    
-    today_status = 'Belum Absen'
-    if today_presensi:
-        today_status = today_presensi.status
-    
-    # Stats bulan ini
-    start_of_month = today.replace(day=1)
-    monthly_presensi = Presensi.objects.filter(
-        siswa=user,
-        sesi__tanggal__gte=start_of_month,
-        sesi__kelas_id__in=kelas_ids
-    )
-    
-    hadir_count = monthly_presensi.filter(status=Presensi.Status.HADIR).count()
-    terlambat_count = monthly_presensi.filter(status=Presensi.Status.TERLAMBAT).count()
-    total_sesi_bulan_ini = SesiPresensi.objects.filter(
-        tanggal__gte=start_of_month,
-        tanggal__lte=today,
-        status=SesiPresensi.Status.SELESAI,
-        kelas_id__in=kelas_ids
-    ).count()
+    """Get statistics for siswa dashboard, served from the per-month stats cache"""
+    monthly = stats.get(request.user.id, date.today())
     
     attendance_rate = 0
-    if total_sesi_bulan_ini > 0:
-        attendance_rate = round((hadir_count / total_sesi_bulan_ini) * 100, 1)
+    if monthly['total'] > 0:
+        attendance_rate = round((monthly['present'] / monthly['total']) * 100, 1)
     
     return Response({
-        'todayStatus': today_status,
+        'todayStatus': monthly['today_status'] or 'Belum Absen',
         'monthlyStats': {
-            'present': hadir_count,
-            'late': terlambat_count,
-            'total': total_sesi_bulan_ini
+            'present': monthly['present'],
+            'late': monthly['late'],
+            'total': monthly['total']
         },
         'attendanceRate': attendance_rate
     })
 
 
+def _riwayat_siswa_row(row):
+    return {
+        'id': row.presensi_id,
+        'sesi_id': row.sesi_id,
+        'kelas_nama': row.kelas_nama,
+        'mata_pelajaran_nama': row.mata_pelajaran_nama,
+        'tanggal': row.tanggal,
+        'jam_mulai': row.window_mulai.strftime('%H:%M') if row.window_mulai else '-',
+        'jam_selesai': row.window_selesai.strftime('%H:%M') if row.window_selesai else '-',
+        'waktu_scan': row.waktu_scan,
+        'status': row.status,
+        'guru_nama': row.guru_nama or '-'
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def siswa_riwayat(request):
-    """Get attendance history for siswa"""
-    user = request.user
-    
-    # Get kelas siswa
-    kelas_ids = SiswaKelas.objects.filter(siswa=user).values_list('kelas_id', flat=True)
-    
-    # Get presensi records
-    presensi_list = Presensi.objects.filter(
-        siswa=user,
-        sesi__kelas_id__in=kelas_ids
-    ).select_related('sesi__kelas', 'sesi__kelas__wali_guru').order_by('-sesi__tanggal', '-waktu_scan')[:100]
-    
-    result = []
-    for presensi in presensi_list:
-        sesi = presensi.sesi
-        result.append({
-            'id': presensi.id,
-            'sesi_id': sesi.id,
-            'kelas_nama': sesi.kelas.nama,
-            'mata_pelajaran_nama': sesi.mata_pelajaran.nama if sesi.mata_pelajaran else None,
-            'tanggal': sesi.tanggal,
-            'jam_mulai': sesi.window_mulai.strftime('%H:%M') if sesi.window_mulai else '-',
-            'jam_selesai': sesi.window_selesai.strftime('%H:%M') if sesi.window_selesai else '-',
-            'waktu_scan': presensi.waktu_scan,
-            'status': presensi.status,
-            'guru_nama': sesi.kelas.wali_guru.name if sesi.kelas.wali_guru else '-'
-        })
-    
-    return Response(result)
+    """Get attendance history for siswa, newest first, from the RiwayatSiswa projection"""
+    paginator = RiwayatSiswaPagination()
+    page = paginator.paginate_queryset(RiwayatSiswa.objects.filter(siswa=request.user), request)
+    return paginator.get_paginated_response([_riwayat_siswa_row(row) for row in page])
 
 
 @api_view(['GET'])
@@ -347,25 +625,62 @@ def siswa_riwayat(request):
 def siswa_riwayat_detail(request, presensi_id):
     """Get detail of specific attendance record"""
     try:
-        presensi = Presensi.objects.select_related(
-            'sesi__kelas__wali_guru'
-        ).get(id=presensi_id, siswa=request.user)
-    except Presensi.DoesNotExist:
+        row = RiwayatSiswa.objects.get(presensi_id=presensi_id, siswa=request.user)
+    except RiwayatSiswa.DoesNotExist:
         return Response({'detail': 'Presensi not found'}, status=404)
     
-    sesi = presensi.sesi
+    return Response(_riwayat_siswa_row(row))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def siswa_kalender(request):
+    """Attendance of one month for the siswa calendar (?bulan=YYYY-MM, default this month)"""
+    bulan = request.query_params.get('bulan')
+    try:
+        start = date.fromisoformat(f"{bulan}-01") if bulan else date.today().replace(day=1)
+    except ValueError:
+        return Response({'detail': 'bulan harus YYYY-MM'}, status=400)
+    end = (start + dj_tz.timedelta(days=32)).replace(day=1)
     
-    return Response({
-        'id': presensi.id,
-        'kelas_nama': sesi.kelas.nama,
-        'mata_pelajaran_nama': sesi.mata_pelajaran.nama if sesi.mata_pelajaran else None,
-        'guru_nama': sesi.kelas.wali_guru.name if sesi.kelas.wali_guru else '-',
-        'tanggal': sesi.tanggal,
-        'jam_mulai': sesi.window_mulai.strftime('%H:%M') if sesi.window_mulai else '-',
-        'jam_selesai': sesi.window_selesai.strftime('%H:%M') if sesi.window_selesai else '-',
-        'waktu_scan': presensi.waktu_scan,
-        'status': presensi.status
-    })
+    paginator = KalenderPagination()
+    page = paginator.paginate_queryset(
+        RiwayatSiswa.objects.filter(siswa=request.user, tanggal__gte=start, tanggal__lt=end), request
+    )
+    response = paginator.get_paginated_response([_riwayat_siswa_row(row) for row in page])
+    response.data['bulan'] = f"{start:%Y-%m}"
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def kelas_rekap(request, kelas_id):
+    """Semester recap of one class (?start_date=&end_date=), for its wali guru or an admin"""
+    kelas = Kelas.objects.filter(id=kelas_id).only('id', 'wali_guru_id').first()
+    if kelas is None:
+        return Response({'detail': 'Kelas tidak ditemukan'}, status=404)
+    if request.user.role != User.Role.ADMIN and kelas.wali_guru_id != request.user.id:
+        return Response({'detail': 'Hanya wali kelas atau admin'}, status=403)
+    if not analytics.AVAILABLE:
+        return Response({'detail': 'Rekap membutuhkan numpy'}, status=503)
+    try:
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        start_date = date.fromisoformat(start_date) if start_date else None
+        end_date = date.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return Response({'detail': 'start_date/end_date harus YYYY-MM-DD'}, status=400)
+    
+    result = analytics.recap(analytics.load_matrix(kelas.id, start_date, end_date))
+    return Response(result)
+
+
+def _scan_status(window_mulai, scanned_at, app_settings=None):
+    """HADIR, or TERLAMBAT once the session's late point has passed"""
+    app_settings = app_settings or Settings.get_cached()
+    if scanned_at > app_settings.late_after(window_mulai):
+        return Presensi.Status.TERLAMBAT
+    return Presensi.Status.HADIR
 
 
 @api_view(["POST"])
@@ -374,36 +689,226 @@ def scan_view(request):
     token = request.data.get("token")
     if not token:
         return Response({"detail": "token required"}, status=400)
-    try:
-        sesi = SesiPresensi.objects.get(qr_token=token)
-    except SesiPresensi.DoesNotExist:
-        return Response({"detail": "invalid token"}, status=404)
 
     now = dj_tz.now()
-    if sesi.status != SesiPresensi.Status.AKTIF:
-        return Response({"detail": "sesi tidak aktif"}, status=400)
-    if not (sesi.window_mulai and sesi.window_selesai and sesi.window_mulai <= now <= sesi.window_selesai):
+    if tokens.is_signed(token):
+        # Rotating token: reject forged, stale or out-of-window scans in memory
+        try:
+            claims = tokens.verify(token, now)
+        except tokens.InvalidToken:
+            return Response({"detail": "invalid token"}, status=404)
+        except tokens.ExpiredToken:
+            return Response({"detail": "qr code kedaluwarsa"}, status=400)
+        if not (claims['window_mulai'] <= now <= claims['window_selesai']):
+            return Response({"detail": "di luar window waktu"}, status=400)
+        entry = registry.get_by_id(claims['sesi_id'])
+        lookup = {'id': claims['sesi_id']}
+    else:
+        entry = registry.get(token)
+        lookup = {'qr_token': token}
+
+    if entry is None:
+        try:
+            sesi = registry.load(**lookup)
+        except SesiPresensi.DoesNotExist:
+            return Response({"detail": "invalid token"}, status=404)
+        if sesi.status != SesiPresensi.Status.AKTIF:
+            return Response({"detail": "sesi tidak aktif"}, status=400)
+        entry = registry.register(sesi)
+
+    window_mulai, window_selesai = entry['window_mulai'], entry['window_selesai']
+    if not (window_mulai and window_selesai and window_mulai <= now <= window_selesai):
         return Response({"detail": "di luar window waktu"}, status=400)
 
-    # validasi siswa anggota kelas
-    if not SiswaKelas.objects.filter(kelas_id=sesi.kelas_id, siswa_id=request.user.id).exists():
-        return Response({"detail": "siswa bukan anggota kelas ini"}, status=403)
+    # Repeat scans are answered from the session's scanned set
+    scanned = registry.get_scan(entry['sesi_id'], request.user.id)
+    if scanned is not None:
+        data = scanned
+        created = False
+    else:
+        # validasi siswa anggota kelas saat sesi dibuka (roster snapshot)
+        if request.user.id not in entry['expected_ids']:
+            return Response({"detail": "siswa bukan anggota kelas ini"}, status=403)
 
-    # upsert presensi
-    presensi, created = Presensi.objects.get_or_create(
-        sesi=sesi,
-        siswa=request.user,
-        defaults={"status": Presensi.Status.HADIR},
-    )
+        scan_status = _scan_status(window_mulai, now)
+        if ingest.enabled():
+            # Acknowledge now, the spooled row is written by the next flush
+            presensi = Presensi(
+                sesi_id=entry['sesi_id'], siswa_id=request.user.id, status=scan_status, waktu_scan=now
+            )
+            data = PresensiSerializer(presensi).data
+            created = registry.claim_scan(entry['sesi_id'], request.user.id, window_selesai, data)
+            if created:
+                data['receipt'] = ingest.enqueue(
+                    entry['sesi_id'], request.user.id, presensi.status, presensi.waktu_scan
+                )
+                events.publish(entry['sesi_id'], 'presensi', siswa_id=request.user.id,
+                               status=presensi.status, waktu_scan=presensi.waktu_scan)
+            else:
+                data = registry.get_scan(entry['sesi_id'], request.user.id) or data
+        else:
+            # upsert presensi, its counters and projection commit together
+            with transaction.atomic():
+                presensi, created = Presensi.record_scan(entry['sesi_id'], request.user.id, scan_status)
+                if created:
+                    presensi_written(entry['sesi_id'], [presensi], tanggal=entry['tanggal'])
+            data = PresensiSerializer(presensi).data
+            registry.remember_scan(entry['sesi_id'], request.user.id, window_selesai, data)
     
     # Build response with additional info
-    data = PresensiSerializer(presensi).data
     data['already_scanned'] = not created  # ✅ Flag untuk duplicate scan
-    data['kelas_nama'] = sesi.kelas.nama
-    data['mata_pelajaran_nama'] = sesi.mata_pelajaran.nama if sesi.mata_pelajaran else None
-    data['guru_nama'] = sesi.kelas.wali_guru.name if sesi.kelas.wali_guru else '-'
-    data['tanggal'] = sesi.tanggal
-    data['jam_mulai'] = sesi.window_mulai.strftime('%H:%M') if sesi.window_mulai else '-'
-    data['jam_selesai'] = sesi.window_selesai.strftime('%H:%M') if sesi.window_selesai else '-'
+    data['kelas_nama'] = entry['kelas_nama']
+    data['mata_pelajaran_nama'] = entry['mata_pelajaran_nama']
+    data['guru_nama'] = entry['guru_nama']
+    data['tanggal'] = entry['tanggal']
+    data['jam_mulai'] = entry['jam_mulai']
+    data['jam_selesai'] = entry['jam_selesai']
     
     return Response(data, status=200)
+
+
+# Upper bound for one kiosk reconnect
+MAX_SCAN_BATCH = 1000
+# Tolerated kiosk clock drift ahead of the server
+SCAN_CLOCK_SKEW = dj_tz.timedelta(minutes=2)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def scan_batch_view(request):
+    """Sync scans collected offline by a classroom kiosk
+
+    Body is a list of {token, siswa_id, scanned_at} (or {"records": [...]}).
+    scanned_at is only honoured for guru/admin (kiosk) accounts.
+    Every record is validated against its session window using the original
+    scanned_at, then all accepted records are written in one transaction.
+    A record for a student the closer already marked ALPHA replaces that row
+    (result 'updated'). The response carries a result for each record in
+    request order.
+    """
+    records = request.data if isinstance(request.data, list) else request.data.get("records")
+    if not isinstance(records, list) or not records:
+        return Response({"detail": "records required"}, status=400)
+    if len(records) > MAX_SCAN_BATCH:
+        return Response({"detail": f"maksimal {MAX_SCAN_BATCH} records per batch"}, status=400)
+
+    user = request.user
+    can_submit_others = user.role in (User.Role.GURU, User.Role.ADMIN)
+    now = dj_tz.now()
+    results = [None] * len(records)
+
+    def reject(index, detail):
+        results[index] = {'index': index, 'result': 'rejected', 'detail': detail}
+
+    # Pass 1: parse records and verify signed tokens in memory
+    parsed = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict) or not record.get("token"):
+            reject(index, "token required")
+            continue
+        token = str(record["token"])
+        try:
+            siswa_id = int(record.get("siswa_id") or user.id)
+        except (TypeError, ValueError):
+            reject(index, "siswa_id tidak valid")
+            continue
+        if siswa_id != user.id and not can_submit_others:
+            reject(index, "tidak boleh presensi untuk siswa lain")
+            continue
+
+        # Only kiosk (guru/admin) accounts may backdate a scan; a siswa's own
+        # record counts as scanned now, or it could replay old tokens and dodge lateness
+        if can_submit_others and record.get("scanned_at"):
+            scanned_at = parse_datetime(str(record["scanned_at"]))
+        else:
+            scanned_at = now
+        if scanned_at is None:
+            reject(index, "scanned_at tidak valid")
+            continue
+        if dj_tz.is_naive(scanned_at):
+            scanned_at = dj_tz.make_aware(scanned_at)
+        if scanned_at > now + SCAN_CLOCK_SKEW:
+            reject(index, "scanned_at di masa depan")
+            continue
+
+        if tokens.is_signed(token):
+            try:
+                claims = tokens.verify(token, scanned_at)
+            except tokens.InvalidToken:
+                reject(index, "invalid token")
+                continue
+            except tokens.ExpiredToken:
+                reject(index, "qr code kedaluwarsa")
+                continue
+            key = ('id', claims['sesi_id'])
+        else:
+            key = ('qr_token', token)
+        parsed.append((scanned_at, index, key, siswa_id))
+
+    # Pass 2: load every referenced session in one query
+    sesi_ids = {value for kind, value in (p[2] for p in parsed) if kind == 'id'}
+    qr_tokens = {value for kind, value in (p[2] for p in parsed) if kind == 'qr_token'}
+    sesi_by_key = {}
+    if parsed:
+        sesi_qs = SesiPresensi.objects.filter(
+            Q(id__in=sesi_ids) | Q(qr_token__in=qr_tokens)
+        ).only('id', 'kelas_id', 'tanggal', 'status', 'window_mulai', 'window_selesai', 'qr_token', 'roster_ids')
+        for sesi in sesi_qs:
+            sesi_by_key[('id', sesi.id)] = sesi
+            sesi_by_key[('qr_token', sesi.qr_token)] = sesi
+
+    # Pass 3: validate windows and membership, earliest scan wins within the batch
+    accepted = {}
+    expected_ids = {}
+    for scanned_at, index, key, siswa_id in sorted(parsed, key=lambda p: (p[0], p[1])):
+        sesi = sesi_by_key.get(key)
+        if sesi is None:
+            reject(index, "invalid token")
+            continue
+        # Closed sessions still take scans made while they were open
+        if sesi.status == SesiPresensi.Status.DRAFT:
+            reject(index, "sesi tidak aktif")
+            continue
+        if not (sesi.window_mulai and sesi.window_selesai and sesi.window_mulai <= scanned_at <= sesi.window_selesai):
+            reject(index, "di luar window waktu")
+            continue
+        if sesi.id not in expected_ids:
+            expected_ids[sesi.id] = sesi.expected_ids
+        if siswa_id not in expected_ids[sesi.id]:
+            reject(index, "siswa bukan anggota kelas ini")
+            continue
+        pair = (sesi.id, siswa_id)
+        results[index] = {'index': index, 'sesi_id': sesi.id, 'siswa_id': siswa_id, 'result': 'already_scanned'}
+        if pair not in accepted:
+            accepted[pair] = (index, scanned_at)
+
+    # Pass 4: insert everything new in a single statement and transaction
+    with transaction.atomic():
+        rows = []
+        app_settings = Settings.get_cached()
+        for (sesi_id, siswa_id), (index, scanned_at) in accepted.items():
+            # Lateness is judged by when the kiosk saw the scan, not when it synced
+            scan_status = _scan_status(sesi_by_key[('id', sesi_id)].window_mulai, scanned_at, app_settings)
+            rows.append(Presensi(
+                sesi_id=sesi_id, siswa_id=siswa_id, waktu_scan=scanned_at, status=scan_status
+            ))
+        # A scan from while the session was open replaces the closer's ALPHA
+        new_rows, replaced_rows = Presensi.insert_or_replace_alpha(rows)
+        by_sesi = {}
+        for result, written in (('created', new_rows), ('updated', replaced_rows)):
+            for row in written:
+                index = accepted[(row.sesi_id, row.siswa_id)][0]
+                results[index].update({'result': result, 'status': row.status, 'waktu_scan': row.waktu_scan})
+                by_sesi.setdefault(row.sesi_id, []).append(row)
+        previous_by_sesi = {}
+        for row in replaced_rows:
+            previous_by_sesi.setdefault(row.sesi_id, {})[row.siswa_id] = Presensi.Status.ALPHA
+        for sesi_id, rows in by_sesi.items():
+            presensi_written(
+                sesi_id, rows, previous=previous_by_sesi.get(sesi_id), tanggal=sesi_by_key[('id', sesi_id)].tanggal
+            )
+
+    summary = {'created': 0, 'updated': 0, 'already_scanned': 0, 'rejected': 0}
+    for result in results:
+        summary[result['result']] += 1
+    return Response({'received': len(records), **summary, 'results': results})
@@ -0,0 +1,47 @@
+"""
+Bookkeeping shared by every path that writes Presensi rows.
+
+Call presensi_written() inside (or right after) the transaction that wrote
+the rows; each step defers its side effects until that transaction commits.
+"""
+from collections import Counter
+
+from django.db.models import F
+
+from . import events, readmodel, rollup, stats
+from .models import COUNTER_FIELDS, SesiPresensi
+
+
+def presensi_written(sesi_id, rows, publish=True, previous=None, tanggal=None):
+    """Record that Presensi rows of one session were inserted or updated
+
+    rows are Presensi instances, or anything with siswa_id, status and
+    waktu_scan. previous maps siswa_id to the old status of rows that were
+    updated; every other row counts as newly inserted. publish=False skips
+    live events that were already sent, e.g. for spooled scans acknowledged
+    earlier. tanggal is the session date, looked up when not given.
+    """
+    previous = previous or {}
+    status_deltas = Counter()
+    for row in rows:
+        old_status = previous.get(row.siswa_id)
+        if old_status == row.status:
+            continue
+        if old_status:
+            status_deltas[old_status] -= 1
+        status_deltas[row.status] += 1
+    deltas = {COUNTER_FIELDS[status]: delta for status, delta in status_deltas.items() if delta}
+    if deltas:
+        # One relative UPDATE, so concurrent writers never lose increments
+        SesiPresensi.objects.filter(id=sesi_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        rollup.apply(sesi_id, status_deltas)
+
+    if rows:
+        readmodel.sync([sesi_id], [row.siswa_id for row in rows])
+
+    stats.apply(sesi_id, rows, previous=previous, tanggal=tanggal)
+    if publish:
+        for row in rows:
+            events.publish(sesi_id, 'presensi', siswa_id=row.siswa_id, status=row.status, waktu_scan=row.waktu_scan)
@@ -0,0 +1,86 @@
+"""
+Per-guru cache for the teacher home screen (guru_statistics).
+
+The four figures are computed in one round trip and cached per guru and
+day. Changes to a guru's Kelas, SiswaKelas, Jadwal or SesiPresensi rows drop
+that guru's entry via forget() / forget_kelas(); GURU_STATS_TTL bounds the
+entry like ADMIN_STATS_TTL does in apps.users.dashboard.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Jadwal, Kelas, SiswaKelas
+from apps.attendance.models import SesiPresensi
+
+GURU_STATS_TTL = 10 * 60
+
+HARI = {
+    0: 'Senin',
+    1: 'Selasa',
+    2: 'Rabu',
+    3: 'Kamis',
+    4: 'Jumat',
+    5: 'Sabtu',
+    6: 'Minggu',
+}
+
+
+def _key(guru_id, today):
+    return f"guru-stats:{guru_id}:{today:%Y-%m-%d}"
+
+
+def compute(guru_id, today):
+    """Kelas, distinct siswa, today's jadwal and active sessions of a guru, in one query"""
+    qn = connection.ops.quote_name
+    kelas_table = qn(Kelas._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                (SELECT COUNT(*) FROM {kelas_table} k WHERE k.wali_guru_id = %s),
+                (SELECT COUNT(DISTINCT sk.siswa_id) FROM {qn(SiswaKelas._meta.db_table)} sk
+                 JOIN {kelas_table} k ON k.id = sk.kelas_id WHERE k.wali_guru_id = %s),
+                (SELECT COUNT(*) FROM {qn(Jadwal._meta.db_table)} j
+                 JOIN {kelas_table} k ON k.id = j.kelas_id WHERE k.wali_guru_id = %s AND j.hari = %s),
+                (SELECT COUNT(*) FROM {qn(SesiPresensi._meta.db_table)} s
+                 JOIN {kelas_table} k ON k.id = s.kelas_id WHERE k.wali_guru_id = %s AND s.status = %s)
+            """,
+            [guru_id, guru_id, guru_id, HARI[today.weekday()], guru_id, SesiPresensi.Status.AKTIF],
+        )
+        total_kelas, total_siswa, jadwal_hari_ini, sesi_aktif = cursor.fetchone()
+    return {
+        'totalKelas': total_kelas,
+        'totalSiswa': total_siswa,
+        'jadwalHariIni': jadwal_hari_ini,
+        'sesiAktif': sesi_aktif,
+    }
+
+
+def get(guru_id, today=None):
+    today = today or date.today()
+    key = _key(guru_id, today)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute(guru_id, today)
+        cache.add(key, stats, timeout=GURU_STATS_TTL)
+    return stats
+
+
+def forget(guru_ids):
+    """Drop today's entries of these gurus once the current transaction commits"""
+    keys = [_key(guru_id, date.today()) for guru_id in set(guru_ids) if guru_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_kelas(kelas_ids):
+    """Drop the entries of the wali guru of each of these classes"""
+    kelas_ids = list(kelas_ids)
+
+    def drop():
+        guru_ids = Kelas.objects.filter(id__in=kelas_ids).values_list('wali_guru_id', flat=True)
+        cache.delete_many([_key(guru_id, date.today()) for guru_id in set(guru_ids) if guru_id])
+
+    transaction.on_commit(drop)
@@ -0,0 +1,59 @@
+"""
+Cached membership sets for Kelas rosters.
+
+Each roster is stored under a versioned key; changing a class's members bumps
+the version so the next lookup rebuilds the set with a single query.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import SiswaKelas
+
+# Safety net for roster edits that bypass KelasViewSet (admin, seed commands)
+ROSTER_TTL = 10 * 60
+
+
+def _version_key(kelas_id):
+    return f"kelas-roster-version:{kelas_id}"
+
+
+def _fresh_version():
+    # Time based so a version key lost to eviction never reuses an old number
+    return int(time.time() * 1000)
+
+
+def version(kelas_id):
+    """Current roster version, changes whenever members are added or removed"""
+    key = _version_key(kelas_id)
+    version = cache.get(key)
+    if version is None:
+        version = _fresh_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def member_ids(kelas_id):
+    """Return the frozenset of siswa ids in a class"""
+    key = f"kelas-roster:{kelas_id}:v{version(kelas_id)}"
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            SiswaKelas.objects.filter(kelas_id=kelas_id).values_list('siswa_id', flat=True)
+        )
+        cache.set(key, ids, timeout=ROSTER_TTL)
+    return ids
+
+
+def is_member(kelas_id, siswa_id):
+    return siswa_id in member_ids(kelas_id)
+
+
+def invalidate(kelas_id):
+    """Drop the cached roster after its members change"""
+    key = _version_key(kelas_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
@@ -3,12 +3,13 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Count
-from datetime import date
 
+from . import dashboard, roster
 from .models import Kelas, SiswaKelas, Jadwal, MataPelajaran
 from .serializers import KelasSerializer, SiswaKelasSerializer, JadwalSerializer, MataPelajaranSerializer
+from apps.users import dashboard as admin_dashboard
 from apps.users.permissions import IsAdmin, IsGuru
-from apps.attendance.models import SesiPresensi
+from apps.attendance import readmodel, scheduler, stats
 
 
 class MataPelajaranViewSet(viewsets.ModelViewSet):
@@ -34,7 +35,7 @@ class MataPelajaranViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             qs = qs.filter(is_active=is_active.lower() == 'true')
         
-        return qs
+        return qs.select_related('guru')
     
     def perform_create(self, serializer):
         # Auto-assign guru to current user if guru and no guru specified
@@ -42,6 +43,10 @@ class MataPelajaranViewSet(viewsets.ModelViewSet):
             serializer.save(guru=self.request.user)
         else:
             serializer.save()
+    
+    def perform_update(self, serializer):
+        mapel = serializer.save()
+        readmodel.sync_mapel(mapel)
 
 
 class KelasViewSet(viewsets.ModelViewSet):
@@ -69,27 +74,43 @@ class KelasViewSet(viewsets.ModelViewSet):
         elif siswa_id:
             qs = qs.filter(anggota__siswa_id=siswa_id).distinct()
         
-        return qs
+        return qs.select_related('wali_guru')
     
     def perform_create(self, serializer):
         # Auto-assign wali_guru to current user if guru
         if self.request.user.role == 'GURU':
-            serializer.save(wali_guru=self.request.user)
+            kelas = serializer.save(wali_guru=self.request.user)
         else:
-            serializer.save()
+            kelas = serializer.save()
+        admin_dashboard.forget()
+        dashboard.forget([kelas.wali_guru_id])
+    
+    def perform_update(self, serializer):
+        previous_guru_id = serializer.instance.wali_guru_id
+        kelas = serializer.save()
+        readmodel.sync_kelas(kelas)
+        dashboard.forget([previous_guru_id, kelas.wali_guru_id])
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        admin_dashboard.forget()
+        dashboard.forget([instance.wali_guru_id])
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        page = self.paginate_queryset(self.get_queryset())
         
-        # Add jumlah_siswa to response
+        # Add jumlah_siswa to response, counted for the whole page at once
+        jumlah_siswa = dict(
+            SiswaKelas.objects.filter(kelas__in=page).values('kelas_id').annotate(n=Count('id')).values_list('kelas_id', 'n')
+        )
         result = []
-        for kelas in queryset:
+        for kelas in page:
             data = self.get_serializer(kelas).data
-            data['jumlah_siswa'] = kelas.anggota.count()
+            data['jumlah_siswa'] = jumlah_siswa.get(kelas.id, 0)
             data['guru_nama'] = kelas.wali_guru.name if kelas.wali_guru else None
             result.append(data)
         
-        return Response(result)
+        return self.get_paginated_response(result)
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -109,6 +130,9 @@ class KelasViewSet(viewsets.ModelViewSet):
         serializer = SiswaKelasSerializer(data={"kelas": kelas.id, **request.data})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        roster.invalidate(kelas.id)
+        stats.forget([serializer.instance.siswa_id])
+        dashboard.forget([kelas.wali_guru_id])
         return Response(serializer.data)
     
     @action(detail=True, methods=["get"])
@@ -148,6 +172,9 @@ class KelasViewSet(viewsets.ModelViewSet):
         try:
             siswa_kelas = SiswaKelas.objects.get(kelas=kelas, siswa_id=siswa_id)
             siswa_kelas.delete()
+            roster.invalidate(kelas.id)
+            stats.forget([siswa_kelas.siswa_id])
+            dashboard.forget([kelas.wali_guru_id])
             return Response({'message': 'Student removed from class'})
         except SiswaKelas.DoesNotExist:
             return Response({'error': 'Student not found in this class'}, status=404)
@@ -158,7 +185,7 @@ class JadwalViewSet(viewsets.ModelViewSet):
     serializer_class = JadwalSerializer
 
     def get_queryset(self):
-        qs = super().get_queryset().select_related('kelas')
+        qs = super().get_queryset().select_related('kelas__wali_guru', 'mata_pelajaran__guru')
         kelas_id = self.request.query_params.get("kelas_id")
         guru_id = self.request.query_params.get("guru_id")
         
@@ -173,61 +200,38 @@ class JadwalViewSet(viewsets.ModelViewSet):
         
         return qs
     
+    def perform_create(self, serializer):
+        jadwal = serializer.save()
+        dashboard.forget_kelas([jadwal.kelas_id])
+    
+    def perform_update(self, serializer):
+        previous_kelas_id = serializer.instance.kelas_id
+        jadwal = serializer.save()
+        dashboard.forget_kelas([previous_kelas_id, jadwal.kelas_id])
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        dashboard.forget_kelas([instance.kelas_id])
+    
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        page = self.paginate_queryset(self.get_queryset())
         
         # Enhanced response with kelas info
         result = []
-        for jadwal in queryset:
+        for jadwal in page:
             data = self.get_serializer(jadwal).data
             data['kelas_id'] = jadwal.kelas.id
             data['kelas_nama'] = f"{jadwal.mapel} {jadwal.kelas.nama}"
             data['ruangan'] = jadwal.ruang
             result.append(data)
         
-        return Response(result)
+        return self.get_paginated_response(result)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def guru_statistics(request):
-    """Get statistics for guru dashboard"""
-    user = request.user
-    
-    # Total kelas yang diajar
-    total_kelas = Kelas.objects.filter(wali_guru=user).count()
-    
-    # Total siswa di semua kelas
-    total_siswa = SiswaKelas.objects.filter(
-        kelas__wali_guru=user
-    ).values('siswa').distinct().count()
-    
-    # Jadwal hari ini
-    today = date.today()
-    hari_mapping = {
-        0: 'Senin',
-        1: 'Selasa',
-        2: 'Rabu',
-        3: 'Kamis',
-        4: 'Jumat',
-        5: 'Sabtu',
-        6: 'Minggu'
-    }
-    hari_ini = hari_mapping.get(today.weekday(), 'Senin')
-    jadwal_hari_ini = Jadwal.objects.filter(
-        kelas__wali_guru=user,
-        hari=hari_ini
-    ).count()
-    
-    # Sesi aktif
-    sesi_aktif = SesiPresensi.objects.filter(
-        kelas__wali_guru=user,
-        status=SesiPresensi.Status.AKTIF
-    ).count()
-    
-    return Response({
-        'totalKelas': total_kelas,
-        'totalSiswa': total_siswa,
-        'jadwalHariIni': jadwal_hari_ini,
-        'sesiAktif': sesi_aktif
-    })
+    """Get statistics for guru dashboard, served from the per-guru cache"""
+    # Closing overdue sessions first keeps sesiAktif honest
+    scheduler.sweep_if_due()
+    return Response(dashboard.get(request.user.id))
@@ -1,171 +1,186 @@
 from datetime import date
-from django.db.models import Count, Q
-from rest_framework.decorators import api_view, permission_classes
+from django.db.models import Count, F, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from . import dashboard
 from .models import User, Settings
 from .permissions import IsAdmin
-from apps.attendance.models import SesiPresensi, Presensi
-from apps.classes.models import Kelas
+from apps.attendance.models import SesiPresensi, Presensi, RekapHarian
+from slador_backend.exports import CSVRenderer, XLSXRenderer, XLSX_CONTENT_TYPE, csv_stream, xlsx_stream
+from slador_backend.pagination import KeysetPagination
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdmin])
 def admin_statistics(request):
-    """Get statistics for admin dashboard"""
-    print(f"[AdminStats] User: {request.user} (Role: {request.user.role})")
-    
-    today = date.today()
-    
-    # Count users by role
-    total_students = User.objects.filter(role=User.Role.SISWA, is_active=True).count()
-    total_teachers = User.objects.filter(role=User.Role.GURU, is_active=True).count()
-    
-    # Count today's attendance
-    today_attendance = Presensi.objects.filter(
-        sesi__tanggal=today,
-        status__in=[Presensi.Status.HADIR, Presensi.Status.TERLAMBAT]
-    ).count()
-    
-    # Count total classes
-    total_subjects = Kelas.objects.count()
-    
-    stats = {
-        'totalStudents': total_students,
-        'totalTeachers': total_teachers,
-        'todayAttendance': today_attendance,
-        'totalSubjects': total_subjects
-    }
-    
-    print(f"[AdminStats] Response: {stats}")
-    
-    return Response(stats)
+    """Get statistics for admin dashboard, served from the dashboard cache"""
+    return Response(dashboard.get())
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated, IsAdmin])
-def admin_attendance_report(request):
-    """Get attendance report for admin"""
-    from django.db.models import Count, Q
-    from apps.classes.models import SiswaKelas, Kelas
-    
-    # Get filter parameters
-    start_date = request.query_params.get('startDate')
-    end_date = request.query_params.get('endDate')
+class StudentDetailsPagination(KeysetPagination):
+    ordering = ('siswa__name', 'siswa_id', 'sesi__kelas__nama', 'sesi__kelas_id')
+
+
+PRESENT = [Presensi.Status.HADIR, Presensi.Status.TERLAMBAT]
+
+
+def _report_filters(request):
+    """startDate, endDate and class query params shared by the report endpoints"""
     class_filter = request.query_params.get('class')
-    
-    print(f"[AttendanceReport] Filters - startDate: {start_date}, endDate: {end_date}, class: {class_filter}")
-    
-    # Build queryset
-    qs = Presensi.objects.all()
-    
-    # Apply date filters
+    if class_filter == 'ALL':
+        class_filter = None
+    return request.query_params.get('startDate'), request.query_params.get('endDate'), class_filter
+
+
+def _filter_presensi(qs, start_date, end_date, class_filter):
     if start_date:
         qs = qs.filter(sesi__tanggal__gte=start_date)
     if end_date:
         qs = qs.filter(sesi__tanggal__lte=end_date)
-    
-    # Apply class filter
-    if class_filter and class_filter != 'ALL':
-        # Log all kelas names to debug
-        all_kelas = Kelas.objects.values_list('nama', flat=True)
-        print(f"[AttendanceReport] Available kelas: {list(all_kelas)}")
-        print(f"[AttendanceReport] Filtering by: {class_filter}")
-        
+    if class_filter:
         qs = qs.filter(sesi__kelas__nama__icontains=class_filter)
-        print(f"[AttendanceReport] Query count after filter: {qs.count()}")
+    return qs
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def admin_attendance_report(request):
+    """Get attendance report for admin"""
+    start_date, end_date, class_filter = _report_filters(request)
     
-    # Count by status
-    total_present = qs.filter(status__in=[Presensi.Status.HADIR, Presensi.Status.TERLAMBAT]).count()
-    total_permit = qs.filter(status=Presensi.Status.IZIN).count()
-    total_sick = qs.filter(status=Presensi.Status.SAKIT).count()
-    total_absent = qs.filter(status=Presensi.Status.ALPHA).count()
+    # Status totals come from the daily rollup, not from the presensi rows
+    rekap_qs = RekapHarian.objects.all()
+    if start_date:
+        rekap_qs = rekap_qs.filter(tanggal__gte=start_date)
+    if end_date:
+        rekap_qs = rekap_qs.filter(tanggal__lte=end_date)
+    if class_filter:
+        rekap_qs = rekap_qs.filter(kelas__nama__icontains=class_filter)
+    
+    totals = rekap_qs.aggregate(
+        present=Sum('jumlah', filter=Q(status__in=PRESENT), default=0),
+        permit=Sum('jumlah', filter=Q(status=Presensi.Status.IZIN), default=0),
+        sick=Sum('jumlah', filter=Q(status=Presensi.Status.SAKIT), default=0),
+        absent=Sum('jumlah', filter=Q(status=Presensi.Status.ALPHA), default=0),
+    )
+    
+    # Class breakdown from each closed session's counters and roster snapshot
+    sesi_qs = SesiPresensi.objects.filter(status=SesiPresensi.Status.SELESAI)
+    if start_date:
+        sesi_qs = sesi_qs.filter(tanggal__gte=start_date)
+    if end_date:
+        sesi_qs = sesi_qs.filter(tanggal__lte=end_date)
+    kelas_totals = sesi_qs.values('kelas_id', 'kelas__tingkat', 'kelas__nama').annotate(
+        present=Sum(F('jumlah_hadir') + F('jumlah_terlambat')),
+        izin=Sum('jumlah_izin'),
+        sakit=Sum('jumlah_sakit'),
+        alpha=Sum('jumlah_alpha'),
+        expected=Sum('roster_size'),
+    ).order_by('kelas__tingkat', 'kelas__nama')
     
-    # Get class attendance rate
     class_rates = []
-    for kelas in Kelas.objects.all().order_by('tingkat', 'nama'):
-        # Filter presensi by date if needed
-        kelas_presensi = Presensi.objects.filter(sesi__kelas=kelas)
-        if start_date:
-            kelas_presensi = kelas_presensi.filter(sesi__tanggal__gte=start_date)
-        if end_date:
-            kelas_presensi = kelas_presensi.filter(sesi__tanggal__lte=end_date)
-        
-        total_records = kelas_presensi.count()
-        if total_records > 0:
-            hadir_count = kelas_presensi.filter(
-                status__in=[Presensi.Status.HADIR, Presensi.Status.TERLAMBAT]
-            ).count()
-            rate = round((hadir_count / total_records) * 100, 1)
+    for row in kelas_totals:
+        if row['expected'] > 0:
+            rate = round((row['present'] / row['expected']) * 100, 1)
             
             class_rates.append({
-                'class': kelas.nama,
+                'class': row['kelas__nama'],
                 'rate': rate,
-                'color': 'bg-green-500' if rate >= 90 else 'bg-yellow-500' if rate >= 75 else 'bg-red-500'
+                'color': 'bg-green-500' if rate >= 90 else 'bg-yellow-500' if rate >= 75 else 'bg-red-500',
+                'hadir': row['present'],
+                'izin': row['izin'],
+                'sakit': row['sakit'],
+                'alpha': row['alpha'],
             })
     
-    # Get student details
-    student_details = []
-    
-    # Get all siswa with their attendance
-    siswa_list = User.objects.filter(role=User.Role.SISWA, is_active=True).order_by('name')[:50]  # Limit 50
-    
-    for siswa in siswa_list:
-        # Get siswa's kelas
-        siswa_kelas = SiswaKelas.objects.filter(siswa=siswa).first()
-        if not siswa_kelas:
-            continue
-            
-        # Get presensi for this siswa
-        siswa_presensi = Presensi.objects.filter(siswa=siswa)
-        if start_date:
-            siswa_presensi = siswa_presensi.filter(sesi__tanggal__gte=start_date)
-        if end_date:
-            siswa_presensi = siswa_presensi.filter(sesi__tanggal__lte=end_date)
-        if class_filter and class_filter != 'ALL':
-            siswa_presensi = siswa_presensi.filter(sesi__kelas__nama__icontains=class_filter)
-        
-        total = siswa_presensi.count()
-        if total > 0:
-            hadir = siswa_presensi.filter(status__in=[Presensi.Status.HADIR, Presensi.Status.TERLAMBAT]).count()
-            izin = siswa_presensi.filter(status=Presensi.Status.IZIN).count()
-            sakit = siswa_presensi.filter(status=Presensi.Status.SAKIT).count()
-            alpha = siswa_presensi.filter(status=Presensi.Status.ALPHA).count()
-            percentage = round((hadir / total) * 100, 1)
-            
-            student_details.append({
-                'name': siswa.name,
-                'class': siswa_kelas.kelas.nama,
-                'hadir': hadir,
-                'izin': izin,
-                'sakit': sakit,
-                'alpha': alpha,
-                'percentage': percentage
-            })
+    # Student breakdown per class in one grouped query, one keyset page at a time
+    siswa_qs = _filter_presensi(
+        Presensi.objects.filter(siswa__role=User.Role.SISWA, siswa__is_active=True),
+        start_date, end_date, class_filter,
+    ).values('siswa_id', 'siswa__name', 'sesi__kelas_id', 'sesi__kelas__nama').annotate(
+        total=Count('id'),
+        hadir=Count('id', filter=Q(status__in=PRESENT)),
+        izin=Count('id', filter=Q(status=Presensi.Status.IZIN)),
+        sakit=Count('id', filter=Q(status=Presensi.Status.SAKIT)),
+        alpha=Count('id', filter=Q(status=Presensi.Status.ALPHA)),
+    )
+    paginator = StudentDetailsPagination()
+    student_details = [
+        {
+            'name': row['siswa__name'],
+            'class': row['sesi__kelas__nama'],
+            'hadir': row['hadir'],
+            'izin': row['izin'],
+            'sakit': row['sakit'],
+            'alpha': row['alpha'],
+            'percentage': round((row['hadir'] / row['total']) * 100, 1),
+        }
+        for row in paginator.paginate_queryset(siswa_qs, request)
+    ]
     
     return Response({
-        'totalPresent': total_present,
-        'totalPermit': total_permit,
-        'totalSick': total_sick,
-        'totalAbsent': total_absent,
+        'totalPresent': totals['present'],
+        'totalPermit': totals['permit'],
+        'totalSick': totals['sick'],
+        'totalAbsent': totals['absent'],
         'classRates': class_rates,
-        'studentDetails': student_details
+        'studentDetails': student_details,
+        'studentDetailsNext': paginator.get_next_link(),
     })
 
 
+EXPORT_HEADER = ['Tanggal', 'Kelas', 'Mata Pelajaran', 'Username', 'Nama Siswa', 'Status', 'Waktu Scan']
+EXPORT_CHUNK_SIZE = 2000
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+@renderer_classes([JSONRenderer, CSVRenderer, XLSXRenderer])
+def admin_attendance_export(request):
+    """Download every presensi row matching the report filters as CSV or XLSX"""
+    start_date, end_date, class_filter = _report_filters(request)
+    export_format = request.query_params.get('format', 'csv')
+    
+    # Server-side cursor on PostgreSQL: rows are fetched and written in chunks
+    rows = _filter_presensi(Presensi.objects.all(), start_date, end_date, class_filter).order_by(
+        'sesi__tanggal', 'sesi_id', 'siswa__name', 'id'
+    ).values_list(
+        'sesi__tanggal', 'sesi__kelas__nama', 'sesi__mata_pelajaran__nama',
+        'siswa__username', 'siswa__name', 'status', 'waktu_scan',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    rows = (
+        (tanggal.isoformat(), kelas, mapel, username, name, status_value,
+         timezone.localtime(waktu_scan).strftime('%Y-%m-%d %H:%M:%S'))
+        for tanggal, kelas, mapel, username, name, status_value, waktu_scan in rows
+    )
+    
+    filename = f"presensi_{start_date or 'awal'}_{end_date or date.today().isoformat()}"
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(xlsx_stream(EXPORT_HEADER, rows, 'Presensi'), content_type=XLSX_CONTENT_TYPE)
+        filename += '.xlsx'
+    else:
+        response = StreamingHttpResponse(csv_stream(EXPORT_HEADER, rows), content_type='text/csv; charset=utf-8')
+        filename += '.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated, IsAdmin])
 def admin_settings(request):
     """Get or update admin settings"""
-    settings = Settings.get_settings()
-    
     if request.method == 'GET':
-        # Return settings from database
-        return Response(settings.to_dict())
+        # Served from the settings cache
+        return Response(Settings.get_cached().to_dict())
     
     elif request.method == 'PATCH':
-        # Update settings in database
+        # Update settings in database, save() drops the cached copy
+        settings = Settings.get_settings()
         settings.update_from_dict(request.data, user=request.user)
         return Response({
             'detail': 'Settings updated successfully',
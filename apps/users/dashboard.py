@@ -0,0 +1,66 @@
+"""
+Cached figures for the admin dashboard.
+
+The admin home page polls admin_statistics, so the four figures are computed
+in one query and kept in the cache until a user, kelas or presensi write
+drops them (forget()). Today's attendance is read from the daily rollup,
+which every presensi write already updates.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import User
+from apps.attendance.models import Presensi, RekapHarian
+from apps.classes.models import Kelas
+
+# Safety net for writes that bypass the API (admin site, seed commands)
+ADMIN_STATS_TTL = 60
+
+
+def _key(today):
+    return f"admin-stats:{today:%Y-%m-%d}"
+
+
+def compute(today):
+    """All four dashboard figures in one round trip"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                COALESCE(SUM(CASE WHEN u.role = %s AND u.is_active THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN u.role = %s AND u.is_active THEN 1 ELSE 0 END), 0),
+                (SELECT COALESCE(SUM(r.jumlah), 0) FROM {qn(RekapHarian._meta.db_table)} r
+                 WHERE r.tanggal = %s AND r.status IN (%s, %s)),
+                (SELECT COUNT(*) FROM {qn(Kelas._meta.db_table)})
+            FROM {qn(User._meta.db_table)} u
+            """,
+            [
+                User.Role.SISWA, User.Role.GURU,
+                today, Presensi.Status.HADIR, Presensi.Status.TERLAMBAT,
+            ],
+        )
+        total_students, total_teachers, today_attendance, total_subjects = cursor.fetchone()
+    return {
+        'totalStudents': total_students,
+        'totalTeachers': total_teachers,
+        'todayAttendance': today_attendance,
+        'totalSubjects': total_subjects,
+    }
+
+
+def get(today=None):
+    today = today or date.today()
+    key = _key(today)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute(today)
+        cache.add(key, stats, timeout=ADMIN_STATS_TTL)
+    return stats
+
+
+def forget():
+    """Drop today's figures once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_key(date.today())))
@@ -1,5 +1,14 @@
+from datetime import datetime, timedelta
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+SETTINGS_CACHE_KEY = "users-settings"
+# The local-memory cache is per process, so a save only clears the worker that
+# made it; the others pick the change up within this many seconds
+SETTINGS_CACHE_TTL = 60
 
 
 class User(AbstractUser):
@@ -58,12 +67,44 @@ class Settings(models.Model):
     def __str__(self):
         return f"Settings - {self.school_name}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Covers both the admin site and admin_settings PATCH
+        transaction.on_commit(lambda: cache.delete(SETTINGS_CACHE_KEY))
+    
     @classmethod
     def get_settings(cls):
         """Get or create settings singleton"""
         settings, created = cls.objects.get_or_create(id=1)
+        if created:
+            # Load the time defaults back as time objects instead of strings
+            settings.refresh_from_db()
         return settings
     
+    @classmethod
+    def get_cached(cls):
+        """Settings singleton served from the cache, dropped on every save and after SETTINGS_CACHE_TTL"""
+        settings = cache.get(SETTINGS_CACHE_KEY)
+        if settings is None:
+            settings = cls.get_settings()
+            cache.set(SETTINGS_CACHE_KEY, settings, timeout=SETTINGS_CACHE_TTL)
+        return settings
+    
+    def late_after(self, window_mulai):
+        """Moment after which a scan for a session counts as TERLAMBAT
+
+        Sessions get the same grace period as the school day
+        (late_threshold - attendance_start_time), but never before the day's
+        late_threshold itself.
+        """
+        local_mulai = timezone.localtime(window_mulai)
+        day = local_mulai.date()
+        grace = (
+            datetime.combine(day, self.late_threshold) - datetime.combine(day, self.attendance_start_time)
+        )
+        threshold = timezone.make_aware(datetime.combine(day, self.late_threshold))
+        return max(window_mulai + max(grace, timedelta(0)), threshold)
+    
     def to_dict(self):
         """Convert settings to dictionary"""
         from datetime import time
@@ -4,9 +4,11 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 
+from . import dashboard
 from .serializers import LoginSerializer, UserSerializer
 from .models import User
 from .permissions import IsAdmin
+from apps.attendance import readmodel
 
 
 class LoginView(APIView):
@@ -62,6 +64,11 @@ class MeView(generics.RetrieveUpdateAPIView):
     def partial_update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        user = serializer.save()
+        # A renamed guru shows up in their students' history
+        readmodel.sync_guru(user)
 
 
 class ChangePasswordView(APIView):
@@ -106,3 +113,17 @@ class UserViewSet(viewsets.ModelViewSet):
         if role and role != 'ALL':
             qs = qs.filter(role=role)
         return qs
+    
+    def perform_create(self, serializer):
+        serializer.save()
+        dashboard.forget()
+    
+    def perform_update(self, serializer):
+        user = serializer.save()
+        # Role or is_active may have changed
+        dashboard.forget()
+        readmodel.sync_guru(user)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        dashboard.forget()
@@ -0,0 +1,107 @@
+"""
+Keyset (seek) pagination for list endpoints.
+
+Each page is cut with a WHERE on the ordering columns of the previous page's
+last row instead of an OFFSET, so page 1000 costs the same as page 1. The
+ordering must end in a unique, non-null column (usually id) and should match
+an index. The opaque cursor is the last row's ordering values.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over `ordering`; subclasses set their own"""
+
+    ordering = ("-id",)
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        self.descending = [field.startswith("-") for field in self.ordering]
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(self._seek(self.decode_cursor(cursor)))
+            except (ValidationError, ValueError, TypeError):
+                # Decodable but holding values the ordering columns reject
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells whether another page follows
+        rows = list(queryset[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if has_next else None
+        return rows
+
+    def _seek(self, values):
+        """Rows strictly after `values` in the ordering"""
+        condition = None
+        for i, (field, value) in enumerate(zip(self.fields, values)):
+            lookup = "lt" if self.descending[i] else "gt"
+            step = Q(**{f"{field}__{lookup}": value})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_field: prev_value})
+            condition = step if condition is None else condition | step
+        return condition
+
+    def encode_cursor(self, row):
+        if isinstance(row, dict):
+            values = [row[field] for field in self.fields]
+        else:
+            values = [getattr(row, field) for field in self.fields]
+        # str() keeps full microseconds, unlike DjangoJSONEncoder
+        raw = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
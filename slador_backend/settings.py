@@ -68,6 +68,31 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "slador",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "100000"))},
+    }
+}
+
+# Scan ingestion: "direct" commits every scan, "batched" acknowledges scans
+# with a receipt, spools them locally and flushes them in bulk
+SCAN_INGEST_MODE = os.getenv("SCAN_INGEST_MODE", "direct")
+SCAN_BATCH_INTERVAL_MS = int(os.getenv("SCAN_BATCH_INTERVAL_MS", "500"))
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", "200"))
+SCAN_SPOOL_PATH = os.getenv("SCAN_SPOOL_PATH", str(BASE_DIR / "var" / "scan_spool.sqlite3"))
+
+# Signed QR tokens rotate every QR_TOKEN_ROTATE_SECONDS
+QR_TOKEN_ROTATE_SECONDS = int(os.getenv("QR_TOKEN_ROTATE_SECONDS", "30"))
+
+# Pub/sub behind the live attendance stream (SesiViewSet.stream)
+ATTENDANCE_EVENT_BROKER = os.getenv("ATTENDANCE_EVENT_BROKER", "apps.attendance.events.LocalBroker")
+
+# Overdue AKTIF sessions are closed at most once per SESSION_SWEEP_SECONDS,
+# piggybacking on dashboard requests (0 disables, leaving it to cron)
+SESSION_SWEEP_SECONDS = int(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -92,6 +117,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # Keyset pages: ?cursor= from the "next" link, ?page_size= up to 200
+    "DEFAULT_PAGINATION_CLASS": "slador_backend.pagination.KeysetPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "50")),
 }
 
 SIMPLE_JWT = {
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from apps.users.admin_views import admin_statistics, admin_attendance_report, admin_settings
+from apps.users.admin_views import admin_statistics, admin_attendance_report, admin_attendance_export, admin_settings
 
 from apps.users import urls as users_urls
 
@@ -18,6 +18,7 @@ urlpatterns = [
     # Admin API endpoints (must be before Django admin)
     path("api/admin/statistics", admin_statistics, name="admin-statistics"),
     path("api/admin/attendance/report", admin_attendance_report, name="admin-attendance-report"),
+    path("api/admin/attendance/export", admin_attendance_export, name="admin-attendance-export"),
     path("api/admin/settings", admin_settings, name="admin-settings"),
     # Django admin site
     path("admin/", admin.site.urls),